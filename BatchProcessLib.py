@@ -0,0 +1,181 @@
+"""Headless re-measurement of archived ProcessFolder/<timestamp>_<type> folders.
+
+Folders are streamed through a bounded process pool (at most two queued per
+worker), each finished folder is appended to a JSON-lines checkpoint so an
+interrupted run resumes where it stopped, and one aggregated CSV is written
+at the end. Plots are skipped unless requested.
+
+archive_dir may also be a FrameArchiveLib .frames archive, in which case the
+frames are memory-mapped instead of decoded from image files.
+
+Usage: python BatchProcessLib.py ProcessFolder --out remeasure.csv [--workers 8] [--plot]
+       python BatchProcessLib.py runs.frames --out remeasure.csv
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import ImageProcessLib as IPL
+import StandardDimentions as Stnds
+import FrameArchiveLib
+from ResultsStoreLib import parse_folder_name
+
+STANDARDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "StandardDimentions")
+
+
+def list_archive_folders(archive_dir):
+    if os.path.isfile(archive_dir):
+        # Frame archive: folders are named in its index, outputs go next to it
+        base_dir = os.path.dirname(os.path.abspath(archive_dir))
+        return [os.path.join(base_dir, name) for name in FrameArchiveLib.open_archive(archive_dir).folders()]
+    folders = []
+    for name in sorted(os.listdir(archive_dir)):
+        path = os.path.join(archive_dir, name)
+        if os.path.isdir(path):
+            folders.append(path)
+    return folders
+
+
+def read_checkpoint(checkpoint_path):
+    # folder name -> last recorded row
+    done = {}
+    if not os.path.exists(checkpoint_path):
+        return done
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            done[row["folder"]] = row
+    return done
+
+
+def remeasure_folder(folder_path, plot=False, calibration_mode="sweep", frame_archive=None):
+    """Measures one archived folder and compares it with the standards; never raises.
+
+    With frame_archive, the folder's frames come from that .frames archive and
+    folder_path only receives the plots.
+    """
+    folder_name = os.path.basename(os.path.normpath(folder_path))
+    timestamp, recorded_type = parse_folder_name(folder_name)
+    row = {"folder": folder_name, "timestamp": timestamp, "recorded_type": recorded_type}
+    start = time.perf_counter()
+    try:
+        frames = None
+        if frame_archive is not None:
+            frames = FrameArchiveLib.open_archive(frame_archive).frames_for(folder_name)
+            if plot:
+                os.makedirs(folder_path, exist_ok=True)
+        results = IPL.CalculateAllImages(folder_path, calibration_mode, Workers=1, Plot=plot, Frames=frames)
+        if not results:
+            raise ValueError("no BMP images in folder")
+        average_diameters = IPL.AverageDiameters(results)
+        closest_filetype, comparison_results = Stnds.get_registry(STANDARDS_DIR).compare(average_diameters)
+        row.update({
+            "status": "ok",
+            "closest_type": closest_filetype,
+            "images": len(results),
+            "diameters": [round(float(v), 3) for v in average_diameters],
+            "differences": [round(float(v), 3) for v in comparison_results[closest_filetype]["diameter_differences"]],
+        })
+    except (Exception, SystemExit) as e:  # checkFolder calls sys.exit on missing/empty folders
+        row.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def _init_worker():
+    IPL.InitWorkerProcess(1)
+
+
+def run_batch(archive_dir, out_csv, checkpoint_path=None, workers=None, plot=False, retry_errors=False, calibration_mode="sweep", log=print):
+    """Re-measures every folder under archive_dir and writes one aggregated CSV. Returns the rows."""
+    checkpoint_path = checkpoint_path or os.path.splitext(out_csv)[0] + ".checkpoint.jsonl"
+    done = read_checkpoint(checkpoint_path)
+    pending = [f for f in list_archive_folders(archive_dir)
+               if os.path.basename(f) not in done or (retry_errors and done[os.path.basename(f)].get("status") != "ok")]
+    log(f"{len(done)} folders in checkpoint, {len(pending)} to measure")
+
+    frame_archive = archive_dir if os.path.isfile(archive_dir) else None
+    workers = max(1, workers or os.cpu_count() or 1)
+    max_in_flight = 2 * workers
+    start = time.perf_counter()
+    finished = 0
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        queue = iter(pending)
+        in_flight = set()
+        while True:
+            # Keep the pool fed without materialising a future per archived folder
+            for folder in queue:
+                in_flight.add(pool.submit(remeasure_folder, folder, plot, calibration_mode, frame_archive))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+            completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                row = future.result()
+                done[row["folder"]] = row
+                checkpoint.write(json.dumps(row) + "\n")
+                checkpoint.flush()
+                finished += 1
+                if row["status"] != "ok":
+                    log(f"{row['folder']}: {row['error']}")
+            elapsed = time.perf_counter() - start
+            log(f"{finished}/{len(pending)} folders, {finished / elapsed:.2f} folders/s")
+
+    rows = [done[name] for name in sorted(done)]
+    write_aggregate(rows, out_csv)
+    log(f"Aggregated results written to: {out_csv}")
+    return rows
+
+
+def write_aggregate(rows, out_csv):
+    # One row per folder; diameter columns D0..Dn follow the 0..16 mm standard distances
+    n_points = max([len(r.get("diameters", [])) for r in rows] or [0])
+    header = ["folder", "timestamp", "recorded_type", "closest_type", "status", "images", "seconds"]
+    header += [f"D{i}" for i in range(n_points)] + [f"diff{i}" for i in range(n_points)]
+    tmp_path = out_csv + ".tmp"
+    with open(tmp_path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        for r in rows:
+            diameters = r.get("diameters", [])
+            differences = r.get("differences", [])
+            writer.writerow(
+                [r["folder"], r["timestamp"], r["recorded_type"], r.get("closest_type", ""), r["status"], r.get("images", ""), r.get("seconds", "")]
+                + [f"{v:.3f}" for v in diameters] + [""] * (n_points - len(diameters))
+                + [f"{v:.3f}" for v in differences] + [""] * (n_points - len(differences)))
+    os.replace(tmp_path, out_csv)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-measure archived ProcessFolder runs")
+    parser.add_argument("archive_dir", help="folder holding <timestamp>_<type> run folders, or a .frames archive")
+    parser.add_argument("--out", default="remeasure_results.csv", help="aggregated CSV written at the end")
+    parser.add_argument("--checkpoint", default=None, help="JSON-lines checkpoint (default: next to --out)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: core count)")
+    parser.add_argument("--plot", action="store_true", help="also render the per-image *_measured.png plots")
+    parser.add_argument("--retry-errors", action="store_true", help="measure folders that failed in the checkpoint again")
+    parser.add_argument("--search", action="store_true", help="use the faster golden-section threshold search for calibration")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.archive_dir):
+        print(f"Archive folder not found: {args.archive_dir}")
+        return 1
+    run_batch(args.archive_dir, args.out, args.checkpoint, args.workers, args.plot, args.retry_errors,
+              "search" if args.search else "sweep")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
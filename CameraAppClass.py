@@ -4,10 +4,13 @@ import time
 import re
 import CameraWorkerClass
 import ImageProcessLib as IPL
+import FrameLib
+import PreviewLib
+from ProcessingJobClass import ProcessingJob, ProcessingQueue
 import threading
 from ctypes import *
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QLabel, QLineEdit, QPushButton, QTextEdit, QFileDialog, QMessageBox, QTableWidget, QTableWidgetItem, QSizePolicy
-from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QLabel, QLineEdit, QPushButton, QTextEdit, QFileDialog, QMessageBox, QTableWidget, QTableWidgetItem, QSizePolicy, QListWidget
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, QThreadPool, QEvent
 from PyQt5.QtWidgets import QGraphicsScene
 from PyQt5.uic import loadUi
 from datetime import datetime
@@ -15,8 +18,7 @@ from PyQt5.QtGui import QPixmap, QBrush, QColor
 from PyQt5.QtCore import Qt
 import os
 import glob
-from pymodbus.client import ModbusSerialClient
-from pymodbus.exceptions import ModbusException
+import ModbusLib
 sys.path.append("/MvImport")
 
 from CameraParams_header import *
@@ -63,6 +65,15 @@ def get_error_message(error_code):
 o
 # Main application window
 class CameraApp(QMainWindow):
+    plot_ready_signal = pyqtSignal(str, object)  # plot path, RGBA array; emitted by MAIN on the processing thread
+    plc_delivered_signal = pyqtSignal(int, int, float, object)  # address, value, latency ms, PLCSnapshot or None
+    plc_error_signal = pyqtSignal(str)
+    # "poll" watches Line0 from Python, "trigger" lets the camera trigger on Line0 and deliver frames by callback
+    CAPTURE_MODE = "poll"
+    # Lossless archive format for captured frames (see FrameLib.ARCHIVE_FORMATS) and its compression level
+    ARCHIVE_FORMAT = "png"
+    ARCHIVE_LEVEL = 3
+
     def __init__(self):
         super(CameraApp, self).__init__()
         loadUi("CameraAppUI.ui", self)  # Load the UI file
@@ -146,15 +157,50 @@ class CameraApp(QMainWindow):
         # Connect the log signal and count signal to the log method
         self.camera_worker.log_signal.connect(self.log_to_output)
         self.camera_worker.image_saved_signal.connect(self.check_image_count)  # Connect signal to check image count
+        self.camera_worker.frame_ready_signal.connect(self.on_frame_ready)  # In-memory frames, see FrameLib
+
+        self.pending_frames = {}  # Frame.part -> frames of that part waiting for the rest of the set
+        self.handoff_latency = FrameLib.LatencyStats()  # frame queued by the worker -> picked up here
+        self.archive_writer = FrameLib.ArchiveWriter(format=self.ARCHIVE_FORMAT, level=self.ARCHIVE_LEVEL)
+
+        # One Modbus session for the HMI/PLC bus, opened on first use and kept open
+        self.modbus = ModbusLib.get_session()
+        self.plc_reader = ModbusLib.PLCReader(self.modbus)
+        self.plc_delivered_signal.connect(self.on_plc_delivered)
+        self.plc_error_signal.connect(self.log_to_output)
+        self.result_publisher = ModbusLib.ResultPublisher(
+            self.modbus, self.plc_reader,
+            on_delivered=self.plc_delivered_signal.emit, on_error=self.plc_error_signal.emit)
+
+        # Processing runs off the GUI thread, one job at a time; the list shows queued/running/finished jobs
+        IPL.plt.switch_backend("Agg")  # MAIN plots from the job thread; the GUI only shows the saved PNGs
+        self.processing_queue = ProcessingQueue(self)
+        self.processing_queue.changed.connect(self.update_job_list)
+        self.plot_ready_signal.connect(self.show_plot)  # queued: MAIN emits it from the processing thread
+
+        # Previews are decoded and shrunk on their own pool so they never wait behind a processing job
+        self.preview_cache = PreviewLib.PreviewCache()
+        self.preview_pool = QThreadPool(self)
+        self.preview_pool.setMaxThreadCount(2)
+        self._preview_jobs = {}
+        self._preview_request = 0
+        self.preview_source = None  # path or array behind the current preview, for zooming in
+        self.preview_scale = 1.0  # full-resolution width / preview width
+        self.full_resolution_shown = False
+        self.graphicsView.viewport().installEventFilter(self)
+        self.pB_StopProcess.clicked.connect(self.cancel_processing)
+        self.job_list = QListWidget(self)
+        self.job_list.setMaximumHeight(120)
+        if hasattr(self, 'Layout_InputsAndControls'):
+            self.Layout_InputsAndControls.addWidget(self.job_list)
 
 
 
     def test_rs485_connection(self):
-        import serial
+        # The shared Modbus session owns the port, so test through it rather than opening COM2 a second time
         try:
-            ser = serial.Serial('COM2', 9600, timeout=1)
-            msg = f"Connected to {ser.portstr}"
-            ser.close()
+            snapshot = self.plc_reader.snapshot(max_age=0)
+            msg = f"Connected to {self.modbus.settings['port']}: {snapshot}"
         except Exception as e:
             msg = f"RS485 Error: {e}"
         self.log_to_output(msg)
@@ -181,6 +227,12 @@ class CameraApp(QMainWindow):
 
         # Pass the selected folder to the camera worker
         self.camera_worker.set_save_folder(self.selected_folder)
+        self.camera_worker.capture_mode = self.CAPTURE_MODE
+
+        # Part numbers start again from 0 with every run
+        for frames in self.pending_frames.values():
+            self.release_frames(frames)
+        self.pending_frames = {}
 
         # Disable the start button and enable the stop button
         self.pB_StartCamera.setEnabled(False)
@@ -208,6 +260,12 @@ class CameraApp(QMainWindow):
         self.pB_StartCamera.setEnabled(True)
         self.pB_StopCamera.setEnabled(False)
 
+        if self.handoff_latency.count:
+            self.log_to_output(f"Frame handoff latency: {self.handoff_latency.report()}")
+        if self.result_publisher.delivered or self.result_publisher.retries:
+            self.log_to_output(f"HMI results: {self.result_publisher.stats()}")
+        if self.archive_writer.writes or self.archive_writer.failures:
+            self.log_to_output(f"Archive: {self.archive_writer.report()}")
         self.log_to_output("Camera stopped. You can reconfigure and start again.")
 
     def select_folder(self):
@@ -252,12 +310,13 @@ class CameraApp(QMainWindow):
 
         self.log_to_output(f"Processing images in folder: {self.selected_folder} with type: {selected_type}")
 
-        try:
-            # Call the MAIN function from ImageProcessLib
-            plot_output_path, closest_filetype = IPL.MAIN(self.selected_folder)
+        folder = self.selected_folder
+
+        def on_done(result):
+            plot_output_path, closest_filetype = result
 
             # Try to resolve returned path (IPL.MAIN may return a relative filename)
-            resolved = self.resolve_plot_path(plot_output_path, search_folder=self.selected_folder)
+            resolved = self.resolve_plot_path(plot_output_path, search_folder=folder)
             if not resolved:
                 self.log_to_output(f"Plot not found after IPL.MAIN returned: {plot_output_path}")
             else:
@@ -267,11 +326,14 @@ class CameraApp(QMainWindow):
             self.log_to_output(f"Processing completed. Closest file type: {closest_filetype}")
             self.log_to_output(f"Plot saved at: {plot_output_path}")
 
-            # Display the plot in the UI
-            self.display_image(plot_output_path)
+            # The plot itself was already displayed through plot_ready_signal
 
-        except Exception as e:
-            self.log_to_output(f"Error during processing: {e}")
+        # Call the MAIN function from ImageProcessLib on the processing thread
+        self.processing_queue.submit(
+            os.path.basename(os.path.normpath(folder)), IPL.MAIN, folder, PlotReady=self.plot_ready_signal.emit,
+            on_done=on_done,
+            on_error=lambda message: self.log_to_output(f"Error during processing: {message}"),
+            on_cancel=lambda: self.log_to_output(f"Processing of {folder} cancelled."))
 
     def log_to_output(self, message):
         current_time = datetime.now().strftime("%H:%M")  # Get current time in HH:MM format
@@ -286,7 +348,7 @@ class CameraApp(QMainWindow):
             self.log_to_output(f"Save folder is not set. Using the current directory to count number of images: {folder_path}")
 
         # Count the number of image files in the folder
-        image_files = [f for f in os.listdir(folder_path) if f.endswith(".bmp")]
+        image_files = [f for f in FrameLib.list_frames(folder_path) if f.endswith(".bmp")]
         image_count = len(image_files)
 
         self.log_to_output(f"Number of images in folder: {image_count}")
@@ -301,10 +363,40 @@ class CameraApp(QMainWindow):
             self.log_to_output("3 images captured. Triggering the process ...")
             self.process_images(folder_path, image_files)
             
-    def process_images(self, folder_path, image_files):
-        """Processes the images by moving them into a uniquely named folder inside 'ProcessFolder' in the current directory."""
-        self.log_to_output("Processing images...")
-
+    def on_frame_ready(self):
+        """Collects in-memory frames from the camera worker and processes each part once all its frames are in."""
+        frames = self.camera_worker.frame_queue.drain()
+        if not frames:
+            return
+        now = time.perf_counter()
+        for frame in frames:
+            self.handoff_latency.record((now - frame.captured_at) * 1000)
+            self.pending_frames.setdefault(frame.part, []).append(frame)
+        dropped = self.camera_worker.frame_queue.dropped
+        if self.camera_worker.frame_pool is not None:
+            dropped += self.camera_worker.frame_pool.dropped
+        part_frames = self.pending_frames[frames[-1].part]
+        self.log_to_output(f"Number of frames captured: {len(part_frames)}" + (f" (dropped: {dropped})" if dropped else ""))
+
+        # Display the latest frame in the graphicsView
+        self.display_frame(frames[-1].image)
+
+        frames_per_part = self.camera_worker.frames_per_part
+        for part in sorted(self.pending_frames):
+            if len(self.pending_frames[part]) >= frames_per_part:
+                self.log_to_output(f"{frames_per_part} images captured. Triggering the process ...")
+                self.process_frames(self.pending_frames.pop(part))
+
+        # Frames arrive in part order: an older part still short of frames lost one to a drop
+        latest = frames[-1].part
+        for part in sorted(self.pending_frames):
+            if part < latest:
+                incomplete = self.pending_frames.pop(part)
+                self.log_to_output(f"Part {part} incomplete ({len(incomplete)} of {frames_per_part} frames, dropped: {dropped}), discarded.")
+                self.release_frames(incomplete)
+
+    def create_process_folder(self):
+        """Creates a uniquely named folder inside 'ProcessFolder' in the current directory."""
         # Get the current working directory
         current_dir = os.getcwd()
 
@@ -319,6 +411,56 @@ class CameraApp(QMainWindow):
         unique_folder_path = os.path.join(process_folder_path, unique_folder_name)
         os.makedirs(unique_folder_path)
         self.log_to_output(f"Unique folder created: {unique_folder_path}")
+        return process_folder_path, unique_folder_name, unique_folder_path
+
+    def process_frames(self, frames):
+        """Measures in-memory frames directly; the archive copies are written in the background."""
+        self.log_to_output("Processing images...")
+        process_folder_path, unique_folder_name, unique_folder_path = self.create_process_folder()
+
+        archived = [self.archive_writer.submit(frame.image, self.archive_writer.path_for(unique_folder_path, frame.name)) for frame in frames]
+
+        def measure():
+            # Runs on the processing thread: no GUI calls in here
+            try:
+                plot_output_path, closest_filetype = IPL.MAIN(unique_folder_path, Frames=[(frame.name, frame.image) for frame in frames], PlotReady=self.plot_ready_signal.emit)
+            finally:
+                # The folder is renamed afterwards, so the archive writes must land first
+                archive_errors = []
+                for future in archived:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        archive_errors.append(str(e))
+                self.release_frames(frames)
+            return plot_output_path, closest_filetype, archive_errors
+
+        def on_done(result):
+            plot_output_path, closest_filetype, archive_errors = result
+            for error in archive_errors:
+                self.log_to_output(f"Failed to archive image: {error}")
+            self.finish_processing(process_folder_path, unique_folder_name, unique_folder_path, plot_output_path, closest_filetype)
+
+        def on_cancel():
+            # Never measured: hand the buffers back once the archive copies exist
+            for future, frame in zip(archived, frames):
+                future.add_done_callback(lambda _, frame=frame: self.release_frames([frame]))
+            self.log_to_output(f"Processing of {unique_folder_name} cancelled; images kept in {unique_folder_path}")
+
+        self.processing_queue.submit(
+            unique_folder_name, measure, on_done=on_done, on_cancel=on_cancel,
+            on_error=lambda message: self.log_to_output(f"Error during processing {unique_folder_name}: {message}"))
+
+    def release_frames(self, frames):
+        """Gives pooled frame buffers back to the camera worker (safe to call more than once)."""
+        for frame in frames:
+            if frame.release is not None:
+                frame.release()
+
+    def process_images(self, folder_path, image_files):
+        """Processes the images by moving them into a uniquely named folder inside 'ProcessFolder' in the current directory."""
+        self.log_to_output("Processing images...")
+        process_folder_path, unique_folder_name, unique_folder_path = self.create_process_folder()
 
         # Move the image files to the unique folder
         for image_file in image_files:
@@ -335,9 +477,31 @@ class CameraApp(QMainWindow):
             else:
                 self.log_to_output(f"File not found: {image_file}")
 
-        # Process images and get closest filetype
-        plot_output_path, closest_filetype = IPL.MAIN(unique_folder_path)
-
+        # Process images and get closest filetype on the processing thread
+        self.processing_queue.submit(
+            unique_folder_name, IPL.MAIN, unique_folder_path, PlotReady=self.plot_ready_signal.emit,
+            on_done=lambda result: self.finish_processing(process_folder_path, unique_folder_name, unique_folder_path, *result),
+            on_error=lambda message: self.log_to_output(f"Error during processing {unique_folder_name}: {message}"),
+            on_cancel=lambda: self.log_to_output(f"Processing of {unique_folder_name} cancelled; images kept in {unique_folder_path}"))
+
+    def cancel_processing(self):
+        """Stop Processing: drops queued jobs; a running job finishes in the background and its result is ignored."""
+        cancelled = self.processing_queue.cancel_all()
+        self.log_to_output(f"Cancelled {cancelled} processing job(s)." if cancelled else "No processing jobs to cancel.")
+
+    def update_job_list(self):
+        """Refreshes the job list and enables Stop Processing while anything is queued or running."""
+        self.job_list.clear()
+        for job_id, entry in self.processing_queue.jobs.items():
+            line = f"#{job_id} {entry['description']} - {entry['state']}"
+            if entry["seconds"] is not None:
+                line += f" ({entry['seconds']:.1f} s)"
+            self.job_list.addItem(line)
+        self.job_list.scrollToBottom()
+        self.pB_StopProcess.setEnabled(self.processing_queue.active_count() > 0)
+
+    def finish_processing(self, process_folder_path, unique_folder_name, unique_folder_path, plot_output_path, closest_filetype):
+        """Renames the processed folder after the closest type, reports it to the HMI and shows the results."""
         # resolve plot path (IPL.MAIN may return relative name)
         resolved = self.resolve_plot_path(plot_output_path, search_folder=unique_folder_path)
         if not resolved:
@@ -381,25 +545,18 @@ class CameraApp(QMainWindow):
                 self.log_to_output(f"Error during final fallback search: {e}")
 
         closest_filetype_integer = self.map_filetype_to_integer(closest_filetype)
-        # Read HMI/PLC variable (e.g., M501) at process start and store in self.IS_SX
-        try:
-            # address 501 corresponds to M501; unit/slave id 2 for your HMI (107-ev configured as unit 2)
-            file_type_value = self.read_type_from_plc()
-            self.log_to_output(f"File type from PLC: {file_type_value}")
-        except Exception:
-            # If read fails, set to None and continue
-            self.log_to_output(f"File type from PLC: error")
-
         ###
-        # Write the integer value to the HMI register (report result of image processing)
+        # Queue the integer value for the HMI register (report result of image processing). The publisher
+        # thread writes it and then reads the PLC state; see on_plc_delivered.
         try:
-            self.write_to_hmi_register(closest_filetype_integer)
-        except Exception as e:
+            self.result_publisher.publish(closest_filetype_integer)
+            self.log_to_output(f"Result {closest_filetype_integer} queued for S0 ({self.result_publisher.pending()} pending)")
+        except ValueError as e:
             self.log_to_output(f"Failed to write result to HMI: {e}")
         ###
 
         self.log_to_output(f"Process Is completed, closest file type is:  {closest_filetype}")
-        self.display_image(plot_output_path)
+        # The plot was already displayed through plot_ready_signal when MAIN rendered it
 
         # Try to locate any *_diff.txt file in the processed folder and display it
         try:
@@ -418,302 +575,199 @@ class CameraApp(QMainWindow):
             self.log_to_output(f"Error searching for diff files: {e}")
 
     def write_to_hmi_register(self, value):
-
-        # Configuration (adjust as needed)
-        PORT = 'COM2'        # Confirm your COM port
-        BAUDRATE = 9600      # Match HMI settings
-        SLAVE_ID = 2         # HMI slave address (default=1)
-        S0_ADDRESS = 0       # Correct address for S0 (now confirmed!)
-
-        client = ModbusSerialClient(
-        port=PORT,
-        baudrate=BAUDRATE,
-        parity='E',
-        stopbits=1,
-        bytesize=8,
-        timeout=3
-    )
-    
+        """Writes value to S0 on the HMI through the shared Modbus session."""
         try:
-            if not client.connect():
-                self.log_to_output(f"Modbus connection failed on {PORT}")
-                return
-
-            # Validate value range for a single 16-bit register
-            try:
-                ival = int(value)
-            except Exception:
-                self.log_to_output(f"Invalid value for register: {value}")
-                return
-
-            if not (0 <= ival <= 0xFFFF):
-                self.log_to_output(f"Value {ival} out of range for single register (0..65535). Aborting write.")
-                return
-
-            self.log_to_output(f"Writing {ival} to S0 (address {S0_ADDRESS}) on slave {SLAVE_ID}...")
-
-            # Attempt to call write_register with the correct keyword for this pymodbus version
-            try:
-                from inspect import signature
-                sig = signature(client.write_register)
-                if 'unit' in sig.parameters:
-                    response = client.write_register(S0_ADDRESS, ival, unit=SLAVE_ID)
-                elif 'slave' in sig.parameters:
-                    response = client.write_register(S0_ADDRESS, ival, slave=SLAVE_ID)
-                else:
-                    # positional fallback
-                    response = client.write_register(S0_ADDRESS, ival)
-            except Exception:
-                # Last resort positional call
-                response = client.write_register(S0_ADDRESS, ival)
+            ival = int(value)
+        except Exception:
+            self.log_to_output(f"Invalid value for register: {value}")
+            return
 
-            # Some pymodbus responses use isError(), others use None or boolean
-            try:
-                if response is None:
-                    self.log_to_output("No response from write_register (response is None)")
-                elif hasattr(response, 'isError') and response.isError():
-                    self.log_to_output(f"Modbus write error: {response}")
-                else:
-                    self.log_to_output("Success! Value written to S0.")
-            except Exception as e:
-                self.log_to_output(f"Unexpected response from write_register: {e}")
-        except ModbusException as e:
+        self.log_to_output(f"Writing {ival} to S0 (address {ModbusLib.S0_ADDRESS}) on slave {self.modbus.slave}...")
+        try:
+            self.modbus.write_register(ModbusLib.S0_ADDRESS, ival)
+            self.log_to_output("Success! Value written to S0.")
+        except ValueError as e:
+            self.log_to_output(f"{e}. Aborting write.")
+        except (ConnectionError, IOError) as e:
             self.log_to_output(f"Communication error: {e}")
-        finally:
-            try:
-                client.close()
-            except Exception:
-                pass
 
-    def read_hmi_register(self, address=1, unit=2, port='COM2', baudrate=9600, timeout=3):
-        """Read a single holding register from the HMI/PLC over Modbus RTU and return its integer value.
+    def read_hmi_register(self, address=1, unit=2):
+        """Read a single holding register from the HMI/PLC through the shared Modbus session and return its integer value.
 
-        Defaults assume register 501 (M501), slave/unit id 2, COM2, 9600 baud. Adjust when needed.
-        Returns integer value on success or raises an exception on failure.
+        Raises an exception on failure.
         """
-        client = ModbusSerialClient(
-            port=port,
-            baudrate=baudrate,
-            parity='E',
-            stopbits=1,
-            bytesize=8,
-            timeout=timeout
-        )
-
         try:
-            if not client.connect():
-                raise ConnectionError(f"Modbus connect failed on {port}")
-
-            # Try to call read_holding_registers with the appropriate keyword for installed pymodbus
-            response = None
-            from inspect import signature
-            try:
-                sig = signature(client.read_holding_registers)
-                if 'unit' in sig.parameters:
-                    response = client.read_holding_registers(address, count=1, unit=unit)
-                elif 'slave' in sig.parameters:
-                    response = client.read_holding_registers(address, count=1, slave=unit)
-                else:
-                    # positional fallback
-                    response = client.read_holding_registers(address, 1)
-            except Exception:
-                # If signature introspection fails for any reason, try common call patterns
-                try:
-                    response = client.read_holding_registers(address, 1, unit)
-                except TypeError:
-                    try:
-                        response = client.read_holding_registers(address, 1, unit=unit)
-                    except Exception:
-                        response = client.read_holding_registers(address, 1)
-
-            if response is None:
-                raise IOError(f"No response reading register {address} (unit {unit})")
-
-            if hasattr(response, 'isError') and response.isError():
-                raise IOError(f"Modbus error reading register {address}: {response}")
-
-            # Extract register value in a version-agnostic way
-            if hasattr(response, 'registers') and len(response.registers) > 0:
-                val = int(response.registers[0])
-            else:
-                # older/newer variants
-                try:
-                    val = int(response.getRegister(0))
-                except Exception:
-                    # Try to interpret response as simple tuple/list
-                    try:
-                        if isinstance(response, (list, tuple)) and len(response) > 0:
-                            val = int(response[0])
-                        else:
-                            raise IOError(f"Unexpected Modbus response format: {response}")
-                    except Exception:
-                        raise IOError(f"Unexpected Modbus response format: {response}")
-
+            val = self.modbus.read_holding_registers(address, 1, slave=unit)[0]
             self.log_to_output(f"Read register {address} (unit {unit}) -> {val}")
             return val
-
         except Exception as e:
             self.log_to_output(f"Failed to read HMI register {address}: {e}")
             raise
-        finally:
-            try:
-                client.close()
-            except Exception:
-                pass
 
-    
+    def on_plc_delivered(self, address, value, latency_ms, snapshot):
+        """A result reached the HMI; log it and the file type the PLC reports in the snapshot read right after."""
+        self.log_to_output(f"Success! Value {value} written to S0 (address {address}) after {latency_ms:.0f} ms.")
+        if snapshot is not None:
+            register_value = snapshot["D1"]
+            self.log_to_output(f"File type from PLC: {register_value} -> Mapped integer: {self.map_plc_type(register_value)}")
+
+    def map_plc_type(self, register_value):
+        """Maps the PLC file type register to 6 for SX, 7 for S1, 8 for S2, 9 for F1, 10 for F2, 11 for F3, -1 otherwise."""
+        # Direct mapping to final integer values
+        mapping = {
+            0: 6,   # SX
+            1: 7,   # S1
+            2: 8,   # S2
+            3: 9,   # F1
+            4: 10,  # F2
+            5: 11   # F3
+        }
+        return mapping.get(register_value, -1)
+
     def read_type_from_plc(self):
         """
-        Reads the file type selection from PLC register D4 and maps it to integer.
+        Reads the file type selection from PLC register D1 (from the cached PLC snapshot) and maps it to integer.
         Returns: 6 for SX, 7 for S1, 8 for S2, 9 for F1, 10 for F2, 11 for F3, -1 for error
         """
         try:
-            register_value = self.read_hmi_register(address=1, unit=2, port='COM2', baudrate=9600)
-            
-            # Direct mapping to final integer values
-            mapping = {
-                0: 6,   # SX
-                1: 7,   # S1
-                2: 8,   # S2  
-                3: 9,   # F1
-                4: 10,  # F2
-                5: 11   # F3
-            }
-            
-            result = mapping.get(register_value, -1)
+            register_value = self.plc_reader.snapshot()["D1"]
+            result = self.map_plc_type(register_value)
             self.log_to_output(f"PLC register value: {register_value} -> Mapped integer: {result}")
             return result
-            
+
         except Exception as e:
             self.log_to_output(f"Error reading file type from PLC: {e}")
             return -1
 
 
     def display_image(self, image_path):
-        """Displays the captured image in the graphicsView. Waits briefly for the file to be written and tries multiple loaders."""
+        """Displays an image file in the graphicsView as a preview decoded and shrunk off the GUI thread."""
         if not image_path:
             self.log_to_output("No image path provided to display_image.")
             return
-
-        timeout = 8.0  # seconds
-        interval = 0.2
-        waited = 0.0
-
-        # Wait for file to exist and be non-empty
-        while waited < timeout:
-            if os.path.exists(image_path):
-                try:
-                    size = os.path.getsize(image_path)
-                except Exception as e:
-                    self.log_to_output(f"Could not get file size: {e}")
-                    size = 0
-                if size > 0:
-                    break
-            time.sleep(interval)
-            waited += interval
-
         if not os.path.exists(image_path):
             self.log_to_output(f"Image file does not exist: {image_path}")
             return
-        try:
-            size = os.path.getsize(image_path)
-        except Exception as e:
-            self.log_to_output(f"Could not get file size: {e}")
-            size = 0
-        self.log_to_output(f"Image exists. size={size} bytes, path={image_path}")
-
-        # Try to read file bytes (better when the file gets locked by another process)
-        data = None
-        try:
-            with open(image_path, "rb") as f:
-                data = f.read()
-        except Exception as e:
-            self.log_to_output(f"Failed to open image file for reading: {e}")
-
-        pixmap = QPixmap()
-        loaded = False
 
-        # Primary: try loadFromData if we have bytes
-        if data:
-            try:
-                loaded = pixmap.loadFromData(data)
-                if loaded and not pixmap.isNull():
-                    self.log_to_output("Loaded image with QPixmap.loadFromData()")
-            except Exception as e:
-                self.log_to_output(f"loadFromData failed: {e}")
-                loaded = False
+        request = self.new_preview_request(image_path)
+        cached = self.preview_cache.get(image_path)
+        if cached is not None:
+            self.on_preview_ready(request, cached)
+            return
+        self.run_preview_job(request, self.preview_cache.load, image_path)
+
+    def display_frame(self, image):
+        """Displays an in-memory capture as a preview; the full frame is kept for zooming in."""
+        # Pooled buffers go back to the camera once the part is measured and are then
+        # overwritten, so the preview and a later zoom work on a private copy
+        image = image.copy()
+        request = self.new_preview_request(image)
+        self.run_preview_job(request, PreviewLib.make_preview, image)
+
+    def new_preview_request(self, source):
+        # Only the latest request is displayed; slower earlier ones are dropped when they finish
+        self._preview_request += 1
+        self.preview_source = source
+        self.preview_scale = 1.0
+        self.full_resolution_shown = False
+        return self._preview_request
+
+    def run_preview_job(self, request, function, *args):
+        job = ProcessingJob(request, function, *args)
+        job.signals.finished.connect(self.on_preview_ready)
+        job.signals.failed.connect(self.on_preview_failed)
+        self._preview_jobs[request] = job  # keep the runnable alive until it reports back
+        self.preview_pool.start(job)
+
+    def on_preview_ready(self, request, result):
+        self._preview_jobs.pop(request, None)
+        if request != self._preview_request:
+            return
+        preview, self.preview_scale = result
+        self.display_array(preview)
 
-        # Secondary: try direct load from path
-        if not loaded:
-            try:
-                loaded = pixmap.load(image_path)
-                if loaded and not pixmap.isNull():
-                    self.log_to_output("Loaded image with QPixmap.load(path)")
-            except Exception as e:
-                self.log_to_output(f"QPixmap.load(path) failed: {e}")
-                loaded = False
+    def on_preview_failed(self, request, message):
+        self._preview_jobs.pop(request, None)
+        if request == self._preview_request:
+            self.log_to_output(f"Failed to load image: {message}")
 
-        # Fallback: try QImage then convert
-        if (not loaded) or pixmap.isNull():
-            try:
-                from PyQt5.QtGui import QImage
-                img = QImage()
-                if data:
-                    ok = img.loadFromData(data)
-                else:
-                    ok = img.load(image_path)
-                if ok and not img.isNull():
-                    pixmap = QPixmap.fromImage(img)
-                    loaded = True
-                    self.log_to_output("Loaded image via QImage -> QPixmap")
-                else:
-                    self.log_to_output("QImage could not load the image")
-            except Exception as e:
-                self.log_to_output(f"QImage fallback failed: {e}")
-
-        # Optional diagnostic using PIL to verify image validity (if installed)
-        if (not loaded) and data:
-            try:
-                from io import BytesIO
-                try:
-                    from PIL import Image
-                    bio = BytesIO(data)
-                    im = Image.open(bio)
-                    im.verify()  # will raise if image is broken
-                    # reload to get a usable image
-                    bio.seek(0)
-                    im = Image.open(bio).convert("RGBA")
-                    # convert PIL image to QImage
-                    from PyQt5.QtGui import QImage
-                    qim = QImage(im.tobytes("raw", "RGBA"), im.width, im.height, QImage.Format_RGBA8888)
-                    pixmap = QPixmap.fromImage(qim)
-                    loaded = True
-                    self.log_to_output("Validated and loaded image via PIL -> QImage")
-                except ImportError:
-                    self.log_to_output("PIL not available; skipping PIL validation")
-                except Exception as e:
-                    self.log_to_output(f"PIL validation failed: {e}")
-            except Exception:
-                pass
-
-        if (not loaded) or pixmap.isNull():
-            self.log_to_output(f"Failed to load image: {image_path}")
+    def load_full_resolution(self):
+        """Swaps the preview for the full-resolution image once the view is zoomed past the preview's pixels."""
+        if self.full_resolution_shown or self.preview_scale <= 1.0 or self.preview_source is None:
+            return
+        if self.graphicsView.transform().m11() <= 1.0:
             return
+        self.full_resolution_shown = True
+        request = self._preview_request
+        if isinstance(self.preview_source, str):
+            job = ProcessingJob(request, PreviewLib.load_full, self.preview_source)
+            job.signals.finished.connect(self.on_full_resolution_ready)
+            job.signals.failed.connect(self.on_preview_failed)
+            self._preview_jobs[-request] = job
+            self.preview_pool.start(job)
+        else:
+            self.on_full_resolution_ready(request, self.preview_source)
 
-        # Display
+    def on_full_resolution_ready(self, request, image):
+        self._preview_jobs.pop(-request, None)
+        if request != self._preview_request:
+            return
+        pixmap = self.array_to_pixmap(image)
+        if pixmap is None:
+            return
+        # Same scene coordinates as the preview, so the current zoom and scroll position stay put
+        self.scene.clear()
+        item = self.scene.addPixmap(pixmap)
+        item.setScale(1.0 / self.preview_scale)
+        item.setTransformationMode(Qt.SmoothTransformation)
+
+    def eventFilter(self, obj, event):
+        # Mouse wheel over the graphicsView zooms; full resolution loads only when it is needed
+        if obj is self.graphicsView.viewport() and event.type() == QEvent.Wheel:
+            factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+            self.graphicsView.scale(factor, factor)
+            self.load_full_resolution()
+            return True
+        return super().eventFilter(obj, event)
+
+    def show_plot(self, plot_output_path, rgba):
+        """Slot for plot_ready_signal: shows the comparison plot MAIN just rendered (already screen sized)."""
+        self.new_preview_request(None)
+        self.display_array(rgba)
+        self.log_to_output(f"Displayed plot: {plot_output_path}")
+
+    def show_pixmap(self, pixmap):
         try:
             self.scene.clear()
             self.scene.addPixmap(pixmap)
             self.graphicsView.fitInView(self.scene.itemsBoundingRect(), Qt.KeepAspectRatio)
-            # Force a UI update
-            try:
-                self.graphicsView.viewport().update()
-            except Exception:
-                pass
-            self.log_to_output(f"Displayed image: {image_path}")
+            self.graphicsView.viewport().update()
         except Exception as e:
             self.log_to_output(f"Failed to display pixmap: {e}")
 
+    def array_to_pixmap(self, image):
+        """QPixmap of a gray, BGR or RGBA NumPy array, or None if it cannot be converted."""
+        from PyQt5.QtGui import QImage
+        try:
+            height, width = image.shape[:2]
+            if image.ndim == 2:
+                qim = QImage(image.data, width, height, image.strides[0], QImage.Format_Grayscale8)
+            elif image.shape[2] == 4:
+                qim = QImage(image.data, width, height, image.strides[0], QImage.Format_RGBA8888)
+            else:
+                qim = QImage(image.data, width, height, image.strides[0], QImage.Format_BGR888)
+            # QImage does not own the NumPy buffer, so copy into the pixmap right away
+            return QPixmap.fromImage(qim.copy())
+        except Exception as e:
+            self.log_to_output(f"Failed to convert image: {e}")
+            return None
+
+    def display_array(self, image):
+        """Displays an in-memory image (gray, BGR or RGBA NumPy array) in the graphicsView."""
+        pixmap = self.array_to_pixmap(image)
+        if pixmap is not None:
+            self.show_pixmap(pixmap)
+
     def resolve_plot_path(self, plot_output_path, search_folder=None):
         """Make returned plot path usable:
            - accept absolute path
@@ -0,0 +1,121 @@
+"""Camera profile: SDK grab-pipeline settings applied when the camera opens.
+
+The profile lives in camera_profile.json next to this module (all keys
+optional, missing ones fall back to DEFAULT_PROFILE):
+
+    {
+        "image_node_num": 8,            # SDK image cache nodes (MV_CC_SetImageNodeNum)
+        "grab_strategy": "OneByOne",    # OneByOne | LatestImagesOnly | LatestImages | UpcomingImage
+        "output_queue_size": 1,         # only used by LatestImages, 1..image_node_num
+        "packet_size": "optimal"        # GigE only: "optimal", a byte count, or null to leave it
+    }
+
+The grab strategy and output queue apply to MV_CC_GetImageBuffer /
+MV_CC_GetOneFrameTimeout grabs; the image callback always gets every frame.
+"""
+import os
+import json
+from ctypes import *
+
+from CameraParams_header import *
+from MvCameraControl_class import *
+
+CAMERA_PROFILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "camera_profile.json")
+
+GRAB_STRATEGIES = {
+    "OneByOne": MV_GrabStrategy_OneByOne,
+    "LatestImagesOnly": MV_GrabStrategy_LatestImagesOnly,
+    "LatestImages": MV_GrabStrategy_LatestImages,
+    "UpcomingImage": MV_GrabStrategy_UpcomingImage,
+}
+
+DEFAULT_PROFILE = {
+    "image_node_num": 8,
+    "grab_strategy": "OneByOne",
+    "output_queue_size": 1,
+    "packet_size": "optimal",
+}
+
+
+def validate_profile(profile):
+    """Returns a complete, checked copy of profile; raises ValueError on bad values."""
+    unknown = set(profile) - set(DEFAULT_PROFILE)
+    if unknown:
+        raise ValueError(f"Unknown camera profile keys: {sorted(unknown)}")
+    merged = dict(DEFAULT_PROFILE, **profile)
+
+    node_num = merged["image_node_num"]
+    if not isinstance(node_num, int) or node_num < 1:
+        raise ValueError(f"image_node_num must be an integer >= 1, got {node_num!r}")
+
+    if merged["grab_strategy"] not in GRAB_STRATEGIES:
+        raise ValueError(f"grab_strategy must be one of {list(GRAB_STRATEGIES)}, got {merged['grab_strategy']!r}")
+
+    queue_size = merged["output_queue_size"]
+    if not isinstance(queue_size, int) or not 1 <= queue_size <= node_num:
+        raise ValueError(f"output_queue_size must be an integer in 1..{node_num}, got {queue_size!r}")
+
+    packet_size = merged["packet_size"]
+    if packet_size is not None and packet_size != "optimal" and (not isinstance(packet_size, int) or packet_size <= 0):
+        raise ValueError(f"packet_size must be \"optimal\", a positive integer or null, got {packet_size!r}")
+    return merged
+
+
+def load_profile(path=CAMERA_PROFILE_FILE):
+    """Reads and validates the profile at path; DEFAULT_PROFILE when the file does not exist."""
+    if not os.path.exists(path):
+        return dict(DEFAULT_PROFILE)
+    with open(path, "r") as f:
+        return validate_profile(json.load(f))
+
+
+def apply_profile(camera, profile, is_gige=False):
+    """Applies profile to an opened (not yet grabbing) camera.
+
+    Returns {setting: value actually in effect, or "error 0x..."} so the
+    caller can report what the SDK accepted.
+    """
+    profile = validate_profile(profile)
+    report = {}
+
+    ret = camera.MV_CC_SetImageNodeNum(profile["image_node_num"])
+    report["image_node_num"] = profile["image_node_num"] if ret == 0 else f"error {hex(ret)}"
+
+    ret = camera.MV_CC_SetGrabStrategy(GRAB_STRATEGIES[profile["grab_strategy"]])
+    report["grab_strategy"] = profile["grab_strategy"] if ret == 0 else f"error {hex(ret)}"
+
+    if profile["grab_strategy"] == "LatestImages":
+        ret = camera.MV_CC_SetOutputQueueSize(profile["output_queue_size"])
+        report["output_queue_size"] = profile["output_queue_size"] if ret == 0 else f"error {hex(ret)}"
+
+    if is_gige and profile["packet_size"] is not None:
+        report["packet_size"] = _apply_packet_size(camera, profile["packet_size"])
+    return report
+
+
+def _apply_packet_size(camera, packet_size):
+    if packet_size == "optimal":
+        packet_size = camera.MV_CC_GetOptimalPacketSize()
+        # The SDK returns the size, or an error code (always above 0x80000000)
+        if packet_size <= 0 or packet_size >= 0x80000000:
+            return f"error {hex(packet_size)}"
+
+    ret = camera.MV_CC_SetIntValue("GevSCPSPacketSize", packet_size)
+    if ret != 0:
+        return f"error {hex(ret)}"
+
+    # Read back: the camera rounds to its own increment
+    stInt = MVCC_INTVALUE()
+    memset(byref(stInt), 0, sizeof(stInt))
+    if camera.MV_CC_GetIntValue("GevSCPSPacketSize", stInt) == 0:
+        return stInt.nCurValue
+    return packet_size
+
+
+def valid_image_num(camera):
+    """Frames waiting in the SDK cache (MV_CC_GetValidImageNum), or None if the call fails."""
+    nValidImageNum = c_uint(0)
+    ret = camera.MV_CC_GetValidImageNum(nValidImageNum)
+    if ret != 0:
+        return None
+    return nValidImageNum.value
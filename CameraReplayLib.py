@@ -0,0 +1,98 @@
+"""Virtual camera that replays recorded frames at a configurable part rate.
+
+ReplayCamera stands in for the MVS camera on a development machine. It
+reads the image folders of image-*/ or ProcessFolder/<run>/ trees
+(anything FrameLib.read_image understands) and treats each folder as one
+part. It then emits that folder's frames on a trigger schedule of
+parts_per_minute, with uniform trigger jitter. CameraWorker.run_replay
+feeds them into the same queue, pool and signal path as real captures.
+That lets throughput and backlog of capture -> count -> process -> HMI be
+measured without hardware.
+"""
+import os
+import time
+import random
+import itertools
+from collections import OrderedDict
+import FrameLib
+
+
+def find_parts(roots, frames_per_part=3):
+    """[[image paths of one part], ...] from every folder under roots that holds images, in path order."""
+    parts = []
+    for root in roots:
+        for folder, _, files in sorted(os.walk(root)):
+            images = sorted(f for f in files if FrameLib.is_frame_file(f))
+            if images:
+                parts.append([os.path.join(folder, f) for f in images[:frames_per_part]])
+    return parts
+
+
+class ReplayCamera:
+    """Frame source replaying recorded parts at parts_per_minute with trigger jitter."""
+
+    def __init__(self, roots, parts_per_minute=20, frames_per_part=3, frame_gap=0.3, jitter=0.05, loop=True, cache_size=12, seed=None):
+        self.roots = [roots] if isinstance(roots, str) else list(roots)
+        self.parts_per_minute = parts_per_minute
+        self.frames_per_part = frames_per_part
+        self.frame_gap = frame_gap  # seconds between the frames of one part
+        self.jitter = jitter  # each trigger lands up to +/- this many seconds off schedule
+        self.loop = loop
+        self.cache_size = cache_size
+        self._random = random.Random(seed)
+        self._cache = OrderedDict()  # path -> decoded image, so replay measures the pipeline rather than the disk
+        self.parts = []
+        self.lateness = FrameLib.LatencyStats()  # how far behind schedule frames were emitted
+        self.frames_emitted = 0
+        self.parts_emitted = 0
+        self._started = None
+
+    def open(self):
+        self.parts = find_parts(self.roots, self.frames_per_part)
+        if not self.parts:
+            raise FileNotFoundError(f"No images to replay under {self.roots}")
+        return len(self.parts)
+
+    def load(self, path):
+        image = self._cache.get(path)
+        if image is None:
+            image = FrameLib.read_image(path)
+            if image is None:
+                raise IOError(f"Could not read image {path}")
+            self._cache[path] = image
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(path)
+        return image
+
+    def frames(self, is_running=lambda: True):
+        """Yields (image, source path) on the trigger schedule until is_running() is False or the parts run out."""
+        interval = 60.0 / self.parts_per_minute
+        self._started = time.perf_counter()
+        part_start = self._started
+        parts = itertools.cycle(self.parts) if self.loop else iter(self.parts)
+        for part in parts:
+            trigger = part_start + self._random.uniform(-self.jitter, self.jitter)
+            for k, path in enumerate(part):
+                due = trigger + k * self.frame_gap
+                while is_running() and time.perf_counter() < due:
+                    time.sleep(min(0.01, max(0.0, due - time.perf_counter())))
+                if not is_running():
+                    return
+                image = self.load(path)
+                self.lateness.record(max(0.0, time.perf_counter() - due) * 1000)
+                self.frames_emitted += 1
+                yield image, path
+            self.parts_emitted += 1
+            part_start += interval
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "parts": self.parts_emitted,
+            "frames": self.frames_emitted,
+            "parts_per_minute": self.parts_emitted / elapsed * 60 if elapsed else 0.0,
+            "target_parts_per_minute": self.parts_per_minute,
+            "lateness": self.lateness.summary(),
+        }
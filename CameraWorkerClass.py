@@ -10,10 +10,21 @@ sys.path.append("/MvImport")
 
 from CameraParams_header import *
 from MvCameraControl_class import *
+import numpy as np
+import cv2
+import FrameLib
+import CameraProfileLib
+
+# Image callback signature expected by MV_CC_RegisterImageCallBackEx
+if sys.platform.startswith("win"):
+    FrameInfoCallBack = WINFUNCTYPE(None, POINTER(c_ubyte), POINTER(MV_FRAME_OUT_INFO_EX), c_void_p)
+else:
+    FrameInfoCallBack = CFUNCTYPE(None, POINTER(c_ubyte), POINTER(MV_FRAME_OUT_INFO_EX), c_void_p)
 
 class CameraWorker(QObject):
     log_signal = pyqtSignal(str)  # Signal to send log messages to the main thread
     image_saved_signal = pyqtSignal(str) # Signal to notify when an image is saved
+    frame_ready_signal = pyqtSignal() # Signal to notify when a frame is waiting in frame_queue
 
     def __init__(self):
         super().__init__()
@@ -22,6 +33,20 @@ class CameraWorker(QObject):
         self.max_retries_value = 5
         self.delay_between_retries_value = 0.05
         self.save_folder = ""  # To store the folder path for saving images
+        self.in_memory = True  # Hand frames over through frame_queue instead of saving BMP files
+        self.frame_queue = FrameLib.FrameQueue(maxsize=6)
+        self.capture_mode = "poll"  # "poll": watch LineStatus in a loop, "trigger": camera triggers on Line0 and calls us back
+        self.delivery_latency = FrameLib.LatencyStats()  # SDK host timestamp -> frame queued
+        self._frame_callback = None  # keeps the ctypes callback alive while registered
+        self.pool_size = 8  # preallocated frame buffers, see FrameLib.FramePool
+        self.frame_pool = None
+        self._staging = None  # raw payload buffer for pixel formats that need converting
+        self.profile_path = CameraProfileLib.CAMERA_PROFILE_FILE
+        self.backlog_peak = 0  # most frames seen waiting in the SDK cache
+        self.replay = None  # CameraReplayLib.ReplayCamera to use instead of the MVS camera
+        self.frames_per_part = 3  # triggers per part, see part_of
+        self._triggers = 0  # Line0 rising edges seen in poll mode this run
+        self._first_frame_num = None  # SDK frame number of the first frame this run in trigger mode
 
     def set_parameters(self, max_retries, delay_between_retries):
         """Sets the parameters for the camera worker."""
@@ -32,8 +57,18 @@ class CameraWorker(QObject):
         """Sets the folder path for saving images."""
         self.save_folder = folder_path
 
+    def set_replay(self, replay):
+        """Replays recorded frames (a CameraReplayLib.ReplayCamera) instead of opening the camera; None restores it."""
+        self.replay = replay
+
     def run_camera(self):
         """Runs the camera operations."""
+        self._triggers = 0
+        self._first_frame_num = None
+        if self.replay is not None:
+            self.run_replay()
+            return
+
         # Initialize camera
         self.camera = MvCamera()
         device_list = MV_CC_DEVICE_INFO_LIST()
@@ -60,6 +95,16 @@ class CameraWorker(QObject):
 
         self.log_signal.emit("Camera opened successfully.")
 
+        self.apply_camera_profile(st_device_info.nTLayerType == MV_GIGE_DEVICE)
+
+        if self.in_memory:
+            self.create_frame_pool()
+
+        if self.capture_mode == "trigger" and not self.configure_hardware_trigger():
+            self.camera.MV_CC_CloseDevice()
+            self.camera.MV_CC_DestroyHandle()
+            return
+
         # Start grabbing
         ret = self.camera.MV_CC_StartGrabbing()
         if ret != 0:
@@ -71,6 +116,10 @@ class CameraWorker(QObject):
         # Monitor Line0 and capture images
         last_line0_state = False
         try:
+            while self.running and self.capture_mode == "trigger":
+                # Frames arrive through on_frame on the SDK's thread
+                time.sleep(0.1)
+
             while self.running:  # Loop while the running flag is True
                 # Get current state of Line0
                 stBool = c_bool(False)
@@ -84,17 +133,41 @@ class CameraWorker(QObject):
                 # Check for rising edge (low to high transition)
                 if not last_line0_state and current_line0_state:
                     self.log_signal.emit("Rising edge detected on Line0. Capturing image...")
+                    # Counted before grabbing, so a failed grab or a dropped frame doesn't shift later parts
+                    part = self.part_of(self._triggers)
+                    self._triggers += 1
 
-                    # Grab a valid frame
-                    stOutFrame = self.get_valid_frame()
+                    if self.in_memory and self.frame_pool is not None:
+                        # Grab straight into a pooled buffer
+                        frame = self.grab_into_pool(f"image_{time.strftime('%Y%m%d_%H%M%S')}", part)
+                        if frame is not None:
+                            self.frame_queue.put(frame)
+                            self.frame_ready_signal.emit()
+                        self.backlog()
+                        stOutFrame = None
+                    else:
+                        # Grab a valid frame
+                        stOutFrame = self.get_valid_frame()
                     if stOutFrame:
-                        # Save the image
                         timestamp = time.strftime("%Y%m%d_%H%M%S")
-                        file_path = f"image_{timestamp}.bmp"
-                        self.save_image_as_bmp(stOutFrame.stFrameInfo, stOutFrame.pBufAddr, file_path)
+                        if self.in_memory:
+                            # Copy out of the SDK buffer and give it back before handing the frame on
+                            try:
+                                frame = self.copy_frame(stOutFrame.stFrameInfo, stOutFrame.pBufAddr, f"image_{timestamp}", part)
+                            finally:
+                                self.camera.MV_CC_FreeImageBuffer(stOutFrame)
+                            if frame is not None:
+                                self.frame_queue.put(frame)
+                                self.frame_ready_signal.emit()
+                        else:
+                            # Save the image
+                            file_path = f"image_{timestamp}.bmp"
+                            self.save_image_as_bmp(stOutFrame.stFrameInfo, stOutFrame.pBufAddr, file_path)
 
-                        # Free the frame buffer
-                        self.camera.MV_CC_FreeImageBuffer(stOutFrame)
+                            # Free the frame buffer
+                            self.camera.MV_CC_FreeImageBuffer(stOutFrame)
+
+                        self.backlog()
 
                 last_line0_state = current_line0_state
                 time.sleep(0.01)  # Small delay to avoid busy-waiting
@@ -105,10 +178,65 @@ class CameraWorker(QObject):
             # Stop grabbing and close the camera
             if self.camera:
                 self.camera.MV_CC_StopGrabbing()
+                if self.capture_mode == "trigger":
+                    self.camera.MV_CC_SetEnumValue("TriggerMode", MV_TRIGGER_MODE_OFF)
+                    self.log_signal.emit(f"Frame delivery latency: {self.delivery_latency.report()}")
+                if self.frame_pool is not None:
+                    self.log_signal.emit(f"Frame pool: {self.frame_pool.stats()}")
+                self.log_signal.emit(f"Peak SDK backlog: {self.backlog_peak} frame(s)")
                 self.camera.MV_CC_CloseDevice()
                 self.camera.MV_CC_DestroyHandle()
                 self.log_signal.emit("Camera closed.")
 
+    def configure_hardware_trigger(self):
+        """Lets the camera trigger itself on a Line0 rising edge and registers on_frame for the frames."""
+        settings = [
+            ("TriggerMode", MV_TRIGGER_MODE_ON),
+            ("TriggerSource", MV_TRIGGER_SOURCE_LINE0),
+        ]
+        for key, value in settings:
+            ret = self.camera.MV_CC_SetEnumValue(key, value)
+            if ret != 0:
+                self.log_signal.emit(f"Failed to set {key}. Error code: {hex(ret)}")
+                return False
+
+        ret = self.camera.MV_CC_SetEnumValueByString("TriggerActivation", "RisingEdge")
+        if ret != 0:
+            # Not every model exposes it; rising edge is the default
+            self.log_signal.emit(f"TriggerActivation not set, using camera default. Error code: {hex(ret)}")
+
+        self._frame_callback = FrameInfoCallBack(self.on_frame)
+        ret = self.camera.MV_CC_RegisterImageCallBackEx(self._frame_callback, None)
+        if ret != 0:
+            self.log_signal.emit(f"Failed to register image callback. Error code: {hex(ret)}")
+            return False
+
+        self.log_signal.emit("Hardware trigger on Line0 configured.")
+        return True
+
+    def on_frame(self, pData, pFrameInfo, pUser):
+        """Image callback for trigger mode. Runs on the SDK's thread; the buffer is only valid during the call."""
+        try:
+            frame_info = pFrameInfo.contents
+            received_ms = time.time() * 1000
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            if self.in_memory:
+                # The SDK numbers every exposure, so frames it or we drop still count towards their part
+                if self._first_frame_num is None:
+                    self._first_frame_num = frame_info.nFrameNum
+                part = self.part_of(frame_info.nFrameNum - self._first_frame_num)
+                frame = self.copy_frame(frame_info, pData, f"image_{timestamp}", part)
+                if frame is not None:
+                    self.delivery_latency.record(received_ms - frame_info.nHostTimeStamp)
+                    self.frame_queue.put(frame)
+                    self.frame_ready_signal.emit()
+            else:
+                self.save_image_as_bmp(frame_info, pData, f"image_{timestamp}_{frame_info.nFrameNum}.bmp")
+            # Frames the SDK has cached behind this one while we were copying or saving it
+            self.backlog()
+        except Exception as e:
+            self.log_signal.emit(f"Error in image callback: {e}")
+
     def get_valid_frame(self):
         """Attempts to grab a valid frame, retrying if necessary."""
         stOutFrame = MV_FRAME_OUT()
@@ -129,6 +257,170 @@ class CameraWorker(QObject):
         self.log_signal.emit(f"Failed to get valid frame after {self.max_retries_value} retries.")
         return None
 
+    def run_replay(self):
+        """Emits replayed frames through the same pool, queue and signals as real captures."""
+        try:
+            parts = self.replay.open()
+        except Exception as e:
+            self.log_signal.emit(f"Failed to open replay: {e}")
+            return
+        self.log_signal.emit(f"Replaying {parts} recorded part(s) at {self.replay.parts_per_minute} parts/min.")
+
+        queue_peak = 0
+        try:
+            for image, source_path in self.replay.frames(lambda: self.running):
+                self.log_signal.emit(f"Replay trigger: {os.path.basename(source_path)}")
+                timestamp = time.strftime("%Y%m%d_%H%M%S")
+                name = f"image_{timestamp}_{self.replay.frames_emitted}"
+                if self.in_memory:
+                    frame = self.copy_replay_frame(image, name, self.replay.parts_emitted)
+                    if frame is not None:
+                        self.frame_queue.put(frame)
+                        self.frame_ready_signal.emit()
+                    queue_peak = max(queue_peak, len(self.frame_queue))
+                else:
+                    folder = self.save_folder or os.getcwd()
+                    cv2.imwrite(os.path.join(folder, name + ".bmp"), image)
+                    self.image_saved_signal.emit(self.save_folder)
+        except Exception as e:
+            self.log_signal.emit(f"Error: {e}")
+        finally:
+            self.log_signal.emit(f"Replay stopped: {self.replay.stats()}")
+            self.log_signal.emit(f"Frame queue: peak {queue_peak}, dropped {self.frame_queue.dropped}")
+            if self.frame_pool is not None:
+                self.log_signal.emit(f"Frame pool: {self.frame_pool.stats()}")
+
+    def copy_replay_frame(self, image, name, part):
+        """Copies a replayed image into a pooled buffer (the pool is sized from the first frame)."""
+        if self.frame_pool is None or not self.frame_pool.fits(image.shape, image.dtype):
+            self.frame_pool = FrameLib.FramePool(self.pool_size, image.shape, image.dtype)
+        borrowed = self.frame_pool.borrow()
+        if borrowed is None:
+            self.log_signal.emit("Frame pool exhausted, frame dropped.")
+            return None
+        index, buffer = borrowed
+        np.copyto(buffer, image)
+        return FrameLib.Frame(buffer, name, self.replay.frames_emitted, int(time.time() * 1000), self.frame_pool.releaser(index), part)
+
+    def apply_camera_profile(self, is_gige):
+        """Applies the SDK grab settings from the camera profile and logs what took effect."""
+        try:
+            profile = CameraProfileLib.load_profile(self.profile_path)
+        except (OSError, ValueError) as e:
+            self.log_signal.emit(f"Invalid camera profile {self.profile_path}, using defaults: {e}")
+            profile = dict(CameraProfileLib.DEFAULT_PROFILE)
+        report = CameraProfileLib.apply_profile(self.camera, profile, is_gige)
+        self.log_signal.emit(f"Camera profile applied: {report}")
+        return report
+
+    def part_of(self, trigger):
+        """Part index of the trigger-th trigger of this run (counted from 0)."""
+        return trigger // self.frames_per_part
+
+    def backlog(self):
+        """Frames waiting in the SDK cache right now (MV_CC_GetValidImageNum); also tracks the peak."""
+        count = CameraProfileLib.valid_image_num(self.camera)
+        if count:
+            self.backlog_peak = max(self.backlog_peak, count)
+            self.log_signal.emit(f"SDK backlog: {count} frame(s) waiting")
+        return count
+
+    def create_frame_pool(self):
+        """Preallocates pool_size frame buffers sized from the camera's current Width/Height/PixelFormat."""
+        values = {}
+        for key in ("Width", "Height", "PayloadSize"):
+            stInt = MVCC_INTVALUE()
+            memset(byref(stInt), 0, sizeof(stInt))
+            ret = self.camera.MV_CC_GetIntValue(key, stInt)
+            if ret != 0:
+                self.log_signal.emit(f"Failed to get {key}, frames will be allocated per capture. Error code: {hex(ret)}")
+                return False
+            values[key] = stInt.nCurValue
+
+        stEnum = MVCC_ENUMVALUE()
+        memset(byref(stEnum), 0, sizeof(stEnum))
+        ret = self.camera.MV_CC_GetEnumValue("PixelFormat", stEnum)
+        if ret != 0:
+            self.log_signal.emit(f"Failed to get PixelFormat, frames will be allocated per capture. Error code: {hex(ret)}")
+            return False
+        pixel_type = stEnum.nCurValue
+
+        try:
+            shape = FrameLib.output_shape(pixel_type, values["Width"], values["Height"])
+        except ValueError as e:
+            self.log_signal.emit(f"{e}, frames will be allocated per capture.")
+            return False
+
+        self.frame_pool = FrameLib.FramePool(self.pool_size, shape)
+        # Formats that need converting are grabbed into one reusable staging buffer first
+        self._staging = None if FrameLib.is_direct(pixel_type) else (c_ubyte * values["PayloadSize"])()
+        self.log_signal.emit(f"Frame pool ready: {self.pool_size} buffers of {shape}.")
+        return True
+
+    def grab_into_pool(self, name, part=None):
+        """Grabs a frame with MV_CC_GetOneFrameTimeout straight into a pooled buffer, retrying if necessary."""
+        borrowed = self.frame_pool.borrow()
+        if borrowed is None:
+            self.log_signal.emit("Frame pool exhausted, frame dropped.")
+            return None
+        index, image = borrowed
+        release = self.frame_pool.releaser(index)
+
+        if self._staging is None:
+            pData, nDataSize = image.ctypes.data_as(POINTER(c_ubyte)), image.nbytes
+        else:
+            pData, nDataSize = self._staging, sizeof(self._staging)
+
+        stFrameInfo = MV_FRAME_OUT_INFO_EX()
+        memset(byref(stFrameInfo), 0, sizeof(stFrameInfo))
+        for attempt in range(self.max_retries_value):
+            ret = self.camera.MV_CC_GetOneFrameTimeout(pData, nDataSize, stFrameInfo, 1000)  # Timeout of 1000 ms
+            if ret == 0 and stFrameInfo.nWidth > 0 and stFrameInfo.nHeight > 0:
+                self.log_signal.emit(f"Frame grabbed successfully on attempt {attempt + 1}.")
+                break
+            self.log_signal.emit(f"Frame grab failed on attempt {attempt + 1}. Return code: {hex(ret)}")
+            time.sleep(self.delay_between_retries_value)
+        else:
+            release()
+            self.log_signal.emit(f"Failed to get valid frame after {self.max_retries_value} retries.")
+            return None
+
+        try:
+            if self._staging is not None:
+                FrameLib.frame_to_array(stFrameInfo, self._staging, out=image)
+        except Exception:
+            release()
+            raise
+        return FrameLib.Frame(image, f"{name}_{stFrameInfo.nFrameNum}", stFrameInfo.nFrameNum, stFrameInfo.nHostTimeStamp, release, part)
+
+    def copy_frame(self, frame_info, buffer, name, part=None):
+        """Copies the grabbed frame into a NumPy array (a pooled one when available) wrapped in a FrameLib.Frame.
+
+        Returns None when the frame pool is exhausted.
+        """
+        # Frame number keeps names unique when several parts arrive within one second
+        name = f"{name}_{frame_info.nFrameNum}"
+        host_ms = frame_info.nHostTimeStamp
+
+        width, height = FrameLib.frame_size(frame_info)
+        pool = self.frame_pool
+        if pool is None or not pool.fits(FrameLib.output_shape(frame_info.enPixelType, width, height)):
+            image = FrameLib.frame_to_array(frame_info, buffer)
+            return FrameLib.Frame(image, name, frame_info.nFrameNum, host_ms, part=part)
+
+        borrowed = pool.borrow()
+        if borrowed is None:
+            self.log_signal.emit("Frame pool exhausted, frame dropped.")
+            return None
+        index, image = borrowed
+        release = pool.releaser(index)
+        try:
+            FrameLib.frame_to_array(frame_info, buffer, out=image)
+        except Exception:
+            release()
+            raise
+        return FrameLib.Frame(image, name, frame_info.nFrameNum, host_ms, release, part)
+
     def save_image_as_bmp(self, frame_info, buffer, file_path):
         """Saves the captured image as a BMP file."""
         if not self.save_folder:
@@ -9,8 +9,9 @@ import os.path
 
 def create_CNC_code(FileType, stepsize, maxfeed, savefilename, IsReolix):
     
-    data = Stnds.read_info(FileType)
-    ESLH = Stnds.read_ESLH_values(FileType)
+    registry = Stnds.get_registry()
+    data = registry.info(FileType)
+    ESLH = registry.eslh(FileType)
     
     Distances =  data['arrays']['Diameters'][:,0] 
     Diameters =  data['arrays']['Diameters'][:,1] 
@@ -112,7 +113,7 @@ def feed_function(z, feed_max):
     
 def Draw3D(FileType, section, drawHelix, SingleSurface):
     
-    data = Stnds.read_info(FileType)
+    data = Stnds.get_registry().info(FileType)
     
     Distances = data['arrays']['Diameters'][:,0]
     Diameters = data['arrays']['Diameters'][:,1]
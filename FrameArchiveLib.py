@@ -0,0 +1,223 @@
+"""Memory-mapped raw frame archive for bulk re-measurement.
+
+An archive is two files:
+
+    runs.frames             4096-byte header, then one contiguous uint8 grey plane per frame
+    runs.frames.index.json  {"shape": [h, w], "frames": [{"folder": ..., "name": ...}, ...]}
+
+Every frame in an archive has the same shape (the jig camera is fixed), so
+frame i starts at HEADER_SIZE + i * h * w. FrameArchive maps the data file
+with np.memmap and hands out read-only views, so thresholding reads straight
+from the page cache with no decode and no copy. Frames are stored as the
+grey plane ImageContext would derive, because that is all the measurement uses.
+
+Usage:
+    python FrameArchiveLib.py convert ProcessFolder runs.frames
+    python FrameArchiveLib.py info runs.frames
+"""
+import os
+import sys
+import json
+import struct
+import argparse
+import numpy as np
+import cv2
+import FrameLib
+
+MAGIC = b"FRAMEARC"
+VERSION = 1
+HEADER_SIZE = 4096
+_HEADER = struct.Struct("<8sIIII")  # magic, version, count, height, width
+
+
+def index_path(archive_path):
+    return archive_path + ".index.json"
+
+
+def read_header(archive_path):
+    with open(archive_path, "rb") as f:
+        magic, version, count, height, width = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{archive_path} is not a frame archive")
+    if version != VERSION:
+        raise ValueError(f"{archive_path}: unsupported frame archive version {version}")
+    return count, (height, width)
+
+
+def read_index(archive_path, count):
+    """(count, frames) from the index, trusting only frames both the header and the index record."""
+    with open(index_path(archive_path), "r") as f:
+        frames = json.load(f)["frames"]
+    count = min(count, len(frames))
+    return count, frames[:count]
+
+
+def to_plane(image):
+    """The grey uint8 plane the measurement uses, as ImageContext derives it."""
+    if image.ndim == 3:
+        if image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if image.dtype != np.uint8:
+        raise ValueError(f"Frame archive stores uint8 planes, got {image.dtype}")
+    return np.ascontiguousarray(image)
+
+
+class FrameArchiveWriter:
+    """Appends frames to a new or existing archive; the header and index are written on close."""
+
+    def __init__(self, archive_path, shape=None):
+        self.path = archive_path
+        if os.path.exists(archive_path):
+            count, self.shape = read_header(archive_path)
+            count, self.frames = read_index(archive_path, count)
+            if count == 0:
+                self.shape = tuple(shape) if shape is not None else None
+            self._file = open(archive_path, "r+b")
+            self._file.seek(HEADER_SIZE + count * self.plane_size)
+            self._file.truncate()  # drop a tail left by an interrupted writer
+        else:
+            self.shape = tuple(shape) if shape is not None else None
+            self.frames = []
+            self._file = open(archive_path, "w+b")
+            self._file.write(b"\0" * HEADER_SIZE)
+
+    @property
+    def plane_size(self):
+        return self.shape[0] * self.shape[1] if self.shape is not None else 0
+
+    def folders(self):
+        return {frame["folder"] for frame in self.frames}
+
+    def append(self, folder, name, image):
+        plane = to_plane(image)
+        if self.shape is None:
+            self.shape = plane.shape
+        if plane.shape != tuple(self.shape):
+            raise ValueError(f"{folder}/{name}: shape {plane.shape} does not match archive shape {tuple(self.shape)}")
+        self._file.write(memoryview(plane).cast("B"))
+        self.frames.append({"folder": folder, "name": name})
+
+    def close(self):
+        if self._file is None:
+            return
+        height, width = self.shape if self.shape is not None else (0, 0)
+        self._file.flush()
+
+        # Index first, header count last: a reader never sees a count the index doesn't cover
+        tmp_path = index_path(self.path) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": VERSION, "shape": [height, width], "frames": self.frames}, f)
+        os.replace(tmp_path, index_path(self.path))
+
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(self.frames), height, width))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameArchive:
+    """Read-only, memory-mapped view of an archive."""
+
+    def __init__(self, archive_path):
+        self.path = archive_path
+        count, self.shape = read_header(archive_path)
+        count, self.frames = read_index(archive_path, count)
+        self._planes = np.memmap(archive_path, dtype=np.uint8, mode="r", offset=HEADER_SIZE, shape=(count,) + tuple(self.shape)) if count else np.empty((0,) + tuple(self.shape), np.uint8)
+        self._by_folder = {}
+        for index, frame in enumerate(self.frames):
+            self._by_folder.setdefault(frame["folder"], []).append(index)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def folders(self):
+        return sorted(self._by_folder)
+
+    def frame(self, index):
+        """Zero-copy read-only view of frame index."""
+        return self._planes[index]
+
+    def frames_for(self, folder):
+        """[(name, FrameRef)] for one archived run, ready for IPL.CalculateAllImages(Frames=...)."""
+        return [(self.frames[i]["name"], FrameRef(self.path, i)) for i in self._by_folder.get(folder, [])]
+
+
+class FrameRef:
+    """Picklable pointer to one archived frame; process-pool workers map the archive themselves."""
+    __slots__ = ("archive_path", "index")
+
+    def __init__(self, archive_path, index):
+        self.archive_path = archive_path
+        self.index = index
+
+    def view(self):
+        return open_archive(self.archive_path).frame(self.index)
+
+
+_open_archives = {}
+
+
+def open_archive(archive_path):
+    """FrameArchive for archive_path, mapped once per process and remapped when the file changes."""
+    key = os.path.abspath(archive_path)
+    stat = os.stat(key)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _open_archives.get(key)
+    if cached is None or cached[0] != signature:
+        cached = (signature, FrameArchive(key))
+        _open_archives[key] = cached
+    return cached[1]
+
+
+def convert_process_folder(process_dir, archive_path, log=print):
+    """Appends every run folder under process_dir that is not archived yet. Returns the frames added."""
+    added = 0
+    with FrameArchiveWriter(archive_path) as writer:
+        archived = writer.folders()
+        for folder in sorted(os.listdir(process_dir)):
+            folder_path = os.path.join(process_dir, folder)
+            if not os.path.isdir(folder_path) or folder in archived:
+                continue
+            images = sorted(FrameLib.list_frames(folder_path))
+            for filename in images:
+                image = FrameLib.read_image(os.path.join(folder_path, filename))
+                if image is None:
+                    log(f"{folder}/{filename}: unreadable, skipped")
+                    continue
+                try:
+                    writer.append(folder, os.path.splitext(filename)[0], image)
+                    added += 1
+                except ValueError as e:
+                    log(f"{e}, skipped")
+            log(f"{folder}: {len(images)} image(s)")
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Raw memory-mapped frame archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="append ProcessFolder run folders to an archive")
+    convert.add_argument("process_dir")
+    convert.add_argument("archive")
+    info = sub.add_parser("info", help="summarise an archive")
+    info.add_argument("archive")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        added = convert_process_folder(args.process_dir, args.archive)
+        print(f"{added} frame(s) added to {args.archive}")
+    else:
+        archive = FrameArchive(args.archive)
+        print(f"{len(archive)} frame(s) of {archive.shape[1]}x{archive.shape[0]} in {len(archive.folders())} folder(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
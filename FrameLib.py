@@ -0,0 +1,383 @@
+"""In-memory frames for the capture -> measurement path.
+
+The worker copies each MV_FRAME_OUT buffer once into a NumPy array
+(frame_to_array), hands it to the GUI through a bounded FrameQueue and the
+GUI gives it straight to ImageProcessLib. Writing the frame to disk is left
+to ArchiveWriter, which runs in the background. FramePool keeps a fixed
+set of frame buffers so steady-state capture does not allocate.
+"""
+import os
+import mmap
+import time
+import zipfile
+import threading
+from collections import deque
+from ctypes import POINTER, c_ubyte, cast
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+
+from PixelType_header import *
+
+# OpenCV names Bayer conversions after the second row of the pattern, so an
+# RGGB sensor needs COLOR_BayerBG2BGR and so on.
+_BAYER8_TO_BGR = {
+    PixelType_Gvsp_BayerRG8: cv2.COLOR_BayerBG2BGR,
+    PixelType_Gvsp_BayerGR8: cv2.COLOR_BayerGB2BGR,
+    PixelType_Gvsp_BayerGB8: cv2.COLOR_BayerGR2BGR,
+    PixelType_Gvsp_BayerBG8: cv2.COLOR_BayerRG2BGR,
+}
+_MONO16_BITS = {
+    PixelType_Gvsp_Mono10: 10,
+    PixelType_Gvsp_Mono12: 12,
+    PixelType_Gvsp_Mono16: 16,
+}
+
+
+class Frame:
+    """One captured image plus the capture metadata the pipeline needs."""
+    __slots__ = ("image", "name", "frame_num", "part", "host_timestamp_ms", "captured_at", "release")
+
+    def __init__(self, image, name, frame_num=0, host_timestamp_ms=0, release=None, part=None):
+        self.image = image
+        self.name = name
+        self.frame_num = frame_num
+        self.part = part  # which part (set of frames) of the capture run this frame belongs to
+        self.host_timestamp_ms = host_timestamp_ms
+        self.captured_at = time.perf_counter()
+        self.release = release  # called once the consumer no longer needs image
+
+
+def frame_size(frame_info):
+    width = frame_info.nExtendWidth or frame_info.nWidth
+    height = frame_info.nExtendHeight or frame_info.nHeight
+    return width, height
+
+
+def output_shape(pixel_type, width, height):
+    """Shape of the array frame_to_array produces for this pixel type."""
+    if pixel_type == PixelType_Gvsp_Mono8 or pixel_type in _MONO16_BITS:
+        return (height, width)
+    if pixel_type in _BAYER8_TO_BGR or pixel_type in (PixelType_Gvsp_RGB8_Packed, PixelType_Gvsp_BGR8_Packed):
+        return (height, width, 3)
+    raise ValueError(f"Unsupported pixel type: {hex(pixel_type & 0xFFFFFFFF)}")
+
+
+def is_direct(pixel_type):
+    """True when the SDK payload already is the output array, so the grab can write straight into it."""
+    return pixel_type in (PixelType_Gvsp_Mono8, PixelType_Gvsp_BGR8_Packed)
+
+
+def frame_to_array(frame_info, buffer, out=None):
+    """Copies an SDK frame buffer into a NumPy image (8-bit gray or BGR).
+
+    Mono8 and the packed 8-bit colour formats cost exactly one copy, into
+    out when given. Mono10/12/16 are shifted down to 8 bits and Bayer8 is
+    demosaiced to BGR, because the measurement pipeline works on 8-bit planes.
+    """
+    width, height = frame_size(frame_info)
+    pixel_type = frame_info.enPixelType
+    raw = np.ctypeslib.as_array(cast(buffer, POINTER(c_ubyte)), shape=(frame_info.nFrameLen,))
+
+    if pixel_type == PixelType_Gvsp_Mono8:
+        shape, dtype = (height, width), np.uint8
+    elif pixel_type in (PixelType_Gvsp_RGB8_Packed, PixelType_Gvsp_BGR8_Packed):
+        shape, dtype = (height, width, 3), np.uint8
+    elif pixel_type in _BAYER8_TO_BGR:
+        bayer = raw[:width * height].reshape(height, width)
+        return cv2.cvtColor(bayer, _BAYER8_TO_BGR[pixel_type], dst=out)
+    elif pixel_type in _MONO16_BITS:
+        wide = raw[:width * height * 2].view(np.uint16).reshape(height, width)
+        if out is None:
+            out = np.empty((height, width), dtype=np.uint8)
+        np.right_shift(wide, _MONO16_BITS[pixel_type] - 8, out=out, casting="unsafe")
+        return out
+    else:
+        raise ValueError(f"Unsupported pixel type: {hex(pixel_type & 0xFFFFFFFF)}")
+
+    view = raw[:int(np.prod(shape))].reshape(shape)
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    np.copyto(out, view)
+    if pixel_type == PixelType_Gvsp_RGB8_Packed:
+        cv2.cvtColor(out, cv2.COLOR_RGB2BGR, dst=out)
+    return out
+
+
+PAGE_SIZE = mmap.PAGESIZE
+
+
+def aligned_empty(shape, dtype=np.uint8, alignment=PAGE_SIZE):
+    """np.empty whose data pointer starts on an alignment boundary (a page by default)."""
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    raw = np.empty(nbytes + alignment, dtype=np.uint8)
+    offset = (-raw.ctypes.data) % alignment
+    return raw[offset:offset + nbytes].view(dtype).reshape(shape)
+
+
+class FramePool:
+    """Fixed set of preallocated, page-aligned frame buffers.
+
+    The capture path borrows a buffer, fills it (directly from the SDK or via
+    frame_to_array(out=...)) and the consumer gives it back through
+    Frame.release, so steady-state capture allocates nothing large. When
+    every buffer is out, borrow returns None and the frame is counted as
+    dropped instead of growing the pool.
+    """
+
+    def __init__(self, count, shape, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._buffers = [aligned_empty(self.shape, self.dtype) for _ in range(count)]
+        self._free = deque(range(count))  # deque append/popleft are atomic: no lock needed
+        self.borrowed = 0
+        self.dropped = 0
+        self.peak_in_use = 0
+
+    def __len__(self):
+        return len(self._buffers)
+
+    @property
+    def in_use(self):
+        return len(self._buffers) - len(self._free)
+
+    def fits(self, shape, dtype=np.uint8):
+        return tuple(shape) == self.shape and np.dtype(dtype) == self.dtype
+
+    def borrow(self):
+        """Returns (index, array) of a free buffer, or None when the pool is exhausted."""
+        try:
+            index = self._free.popleft()
+        except IndexError:
+            self.dropped += 1
+            return None
+        self.borrowed += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return index, self._buffers[index]
+
+    def give_back(self, index):
+        self._free.append(index)
+
+    def releaser(self, index):
+        """Callable for Frame.release that returns buffer index to the pool exactly once."""
+        returned = []
+
+        def release():
+            if not returned:
+                returned.append(True)
+                self.give_back(index)
+        return release
+
+    def stats(self):
+        return {"size": len(self._buffers), "in_use": self.in_use, "peak_in_use": self.peak_in_use, "borrowed": self.borrowed, "dropped": self.dropped}
+
+
+class FrameQueue:
+    """Bounded hand-off between the capture thread (or SDK callback) and the consumer.
+
+    Built on collections.deque, whose append and popleft are atomic, so
+    neither side takes a lock. When the consumer falls behind, the oldest
+    frame is dropped (and released) rather than blocking the producer.
+    Assumes a single producer.
+    """
+
+    def __init__(self, maxsize=6):
+        self.maxsize = maxsize
+        self._frames = deque()
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        if len(self._frames) >= self.maxsize:
+            try:
+                oldest = self._frames.popleft()
+            except IndexError:
+                oldest = None  # consumer emptied it in the meantime
+            if oldest is not None:
+                self.dropped += 1
+                if oldest.release is not None:
+                    oldest.release()
+        self._frames.append(frame)
+        self.put_count += 1
+
+    def get(self):
+        """Returns the oldest frame, or None when empty."""
+        try:
+            return self._frames.popleft()
+        except IndexError:
+            return None
+
+    def drain(self):
+        frames = []
+        while True:
+            try:
+                frames.append(self._frames.popleft())
+            except IndexError:
+                return frames
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class LatencyStats:
+    """Rolling latency samples in milliseconds (the last `window` of them)."""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, ms):
+        self._samples.append(ms)
+        self.count += 1
+
+    def summary(self):
+        samples = np.array(self._samples, dtype=float)
+        if samples.size == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": float(samples.mean()),
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p95_ms": float(np.percentile(samples, 95)),
+            "max_ms": float(samples.max()),
+        }
+
+    def report(self):
+        stats = self.summary()
+        if not stats["count"]:
+            return "no samples"
+        return "n={count} mean={mean_ms:.1f} ms p50={p50_ms:.1f} ms p95={p95_ms:.1f} ms max={max_ms:.1f} ms".format(**stats)
+
+
+# Archive formats: name -> file extension. All are lossless and read back by read_image.
+ARCHIVE_FORMATS = {
+    "bmp": ".bmp",
+    "png": ".png",
+    "tiff-deflate": ".tif",
+    "tiff-zstd": ".tif",
+    "npz": ".npz",
+}
+IMAGE_EXTENSIONS = (".bmp", ".png", ".tif", ".tiff", ".npz")
+# Plots MAIN writes next to the frames it measured (<frame>_measured.png, <type>_comparison_plot.png)
+OUTPUT_SUFFIXES = ("_measured", "_comparison_plot")
+
+
+def is_frame_file(filename):
+    """True for a captured frame in any archive format, False for other files and MAIN's own plots."""
+    stem, extension = os.path.splitext(os.path.basename(filename))
+    return extension.lower() in IMAGE_EXTENSIONS and not stem.endswith(OUTPUT_SUFFIXES)
+
+
+def list_frames(folder):
+    """File names of the captured frames in folder, in os.listdir order."""
+    return [filename for filename in os.listdir(folder) if is_frame_file(filename)]
+
+# libtiff compression tags, for OpenCV builds that do not name them
+_TIFF_COMPRESSION = {
+    "tiff-deflate": getattr(cv2, "IMWRITE_TIFF_COMPRESSION_ADOBE_DEFLATE", 8),
+    "tiff-zstd": getattr(cv2, "IMWRITE_TIFF_COMPRESSION_ZSTD", 50000),
+}
+
+
+def write_image(image, path, format="bmp", level=None):
+    """Writes image losslessly in the given archive format.
+
+    level is the compression level: 0-9 for png (default 3) and npz
+    (default 6). OpenCV exposes no level for TIFF, so it is ignored there.
+    """
+    if format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format {format!r}, expected one of {list(ARCHIVE_FORMATS)}")
+
+    if format == "npz":
+        # np.savez_compressed has no level; write the .npy member ourselves
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=6 if level is None else level) as archive:
+            with archive.open("image.npy", "w", force_zip64=True) as member:
+                np.lib.format.write_array(member, np.ascontiguousarray(image), allow_pickle=False)
+        return
+
+    if format == "png":
+        params = [cv2.IMWRITE_PNG_COMPRESSION, 3 if level is None else level]
+    elif format in _TIFF_COMPRESSION:
+        params = [cv2.IMWRITE_TIFF_COMPRESSION, _TIFF_COMPRESSION[format]]
+    else:
+        params = []
+    if not cv2.imwrite(path, image, params):
+        raise IOError(f"Failed to write {path}")
+
+
+def read_image(path):
+    """Reads any archive format written by write_image (plus plain OpenCV formats); None if unreadable."""
+    if path.lower().endswith(".npz"):
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                return archive["image"]
+        except (OSError, KeyError, ValueError):
+            return None
+    return cv2.imread(path, cv2.IMREAD_UNCHANGED)
+
+
+class ArchiveWriter:
+    """Writes frames to disk in a background thread pool so capture and measurement never wait on it."""
+
+    def __init__(self, workers=2, format="bmp", level=None):
+        if format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format {format!r}, expected one of {list(ARCHIVE_FORMATS)}")
+        self.format = format
+        self.level = level
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="archive")
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.failures = 0
+        self.bytes_written = 0
+        self.raw_bytes = 0  # uncompressed size of everything written
+        self.latency = LatencyStats()
+
+    def path_for(self, folder, name):
+        return os.path.join(folder, name + ARCHIVE_FORMATS[self.format])
+
+    def submit(self, image, path):
+        """Queues image for writing to path; returns a Future resolving to the written path."""
+        return self._executor.submit(self._write, image, path)
+
+    def _write(self, image, path):
+        start = time.perf_counter()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        try:
+            write_image(image, path, self.format, self.level)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            self.writes += 1
+            self.bytes_written += size
+            self.raw_bytes += image.nbytes
+            self.latency.record((time.perf_counter() - start) * 1000)
+        return path
+
+    def stats(self):
+        with self._lock:
+            return {
+                "format": self.format,
+                "writes": self.writes,
+                "failures": self.failures,
+                "bytes_written": self.bytes_written,
+                "bytes_saved": self.raw_bytes - self.bytes_written,
+                "ratio": self.raw_bytes / self.bytes_written if self.bytes_written else 0.0,
+                "latency": self.latency.summary(),
+            }
+
+    def report(self):
+        stats = self.stats()
+        with self._lock:
+            latency = self.latency.report()
+        return (f"{stats['writes']} {stats['format']} frame(s), {stats['bytes_written'] / 1e6:.1f} MB written, "
+                f"{stats['bytes_saved'] / 1e6:.1f} MB saved ({stats['ratio']:.2f}x), "
+                f"{stats['failures']} failure(s), write latency {latency}")
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -2,8 +2,11 @@ import cv2
 import os
 import math
 import sys
-import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+from functools import cached_property
 from scipy.signal import savgol_filter
 from scipy.signal import find_peaks
 from scipy.interpolate import CubicSpline
@@ -13,100 +16,39 @@ import matplotlib.pyplot as plt
 import rawpy
 import imageio
 import StandardDimentions as Stnds 
+import ResultsStoreLib as RSL
+import FrameLib
+import FrameArchiveLib
 
-def MAIN(input_directory):
+def MAIN(input_directory, Workers=None, Frames=None, PlotReady=None):
+    # Frames: optional [(name, image array), ...] captured in memory; the outputs
+    # still go to input_directory, which may not hold the images yet.
+    # PlotReady: optional callback(plot_output_path, rgba array) receiving the
+    # comparison plot as rendered, so a GUI can show it without reading the PNG.
     
-    results = CalculateAllImages(input_directory)
+    results = CalculateAllImages(input_directory, Workers=Workers, Frames=Frames)
 
     # Path to the StandardDimentions folder
     base_dir = "StandardDimentions"
-    data = {}
-    for folder_name in os.listdir(base_dir):
-        folder_path = os.path.join(base_dir, folder_name)
-        if os.path.isdir(folder_path):  # Ensure it's a folder
-            try:
-                data[folder_name] = Stnds.read_info(folder_name, base_dir)
-            except FileNotFoundError as e:
-                print(f"Error reading folder '{folder_name}': {e}")
-
-    # Collect measured diameters from all images
-    all_measured_diameters = []
-    for result in results:
-        measured_diameters = result["MeasuredDs"][1]  # Extract measured diameters
-        all_measured_diameters.append(measured_diameters)
-
-    # Convert to a NumPy array for easier averaging
-    all_measured_diameters = np.array(all_measured_diameters)
+    registry = Stnds.get_registry(base_dir) # parsed once per process, reloaded when a file changes
+    data = registry.data()
 
     # Calculate the average diameter across all images
-    average_diameters = np.mean(all_measured_diameters, axis=0)
+    average_diameters = AverageDiameters(results)
 
     # Save raw average diameters to raw.txt
     raw_output_path = os.path.join(input_directory, "raw.txt")
     with open(raw_output_path, "w") as raw_file:
         for value in average_diameters:
             raw_file.write(f"{value:.3f}\n")
-        # --- Write results to CSV in main folder ---
-    main_folder = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(main_folder, "all_raw_results.csv")
-    folder_name = os.path.basename(os.path.normpath(input_directory))
-    new_column = [folder_name] + [f"{value:.3f}" for value in average_diameters]
-
-    if os.path.exists(csv_path):
-        # Read existing CSV
-        with open(csv_path, "r", newline="") as csvfile:
-            reader = list(csv.reader(csvfile))
-        # Pad rows if needed
-        max_len = max(len(reader), len(new_column))
-        while len(reader) < max_len:
-            reader.append([""] * len(reader[0]))
-        while len(new_column) < max_len:
-            new_column.append("")
-        # Append new column
-        for i, val in enumerate(new_column):
-            reader[i].append(val)
-        # Write back
-        with open(csv_path, "w", newline="") as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerows(reader)
-    else:
-        # Create new CSV with this column
-        with open(csv_path, "w", newline="") as csvfile:
-            writer = csv.writer(csvfile)
-            for val in new_column:
-                writer.writerow([val])
-    # --- End CSV logic ---
-    # Compare the average diameters with the corresponding diameters in the data
-    closest_filetype = None
-    smallest_difference = float("inf")
-    comparison_results = {}
-
-
-    for file_type, file_data in data.items():
-        standard_distances = file_data["arrays"]["Diameters"][:, 0]  # Distances
-        standard_diameters = file_data["arrays"]["Diameters"][:, 1]  # Diameters
-
-        # Only use indices 0,1,2,3,4,10 for closest type comparison
-        compare_indices = [0, 1, 2, 3, 4]
-        compare_indices = [i for i in compare_indices if i < len(standard_distances) and i < len(average_diameters)]
 
-        # For closest type: use only selected indices
-        diameter_comparison_selected = average_diameters[compare_indices] - standard_diameters[compare_indices]
-        total_difference = np.sum(np.abs(diameter_comparison_selected))
-
-        # For output: use all points
-        distance_comparison_all = standard_distances[:min(len(standard_distances), len(average_diameters))]
-        diameter_comparison_all = average_diameters[:min(len(standard_diameters), len(average_diameters))] - standard_diameters[:min(len(standard_diameters), len(average_diameters))]
-
-        comparison_results[file_type] = {
-            "distances": distance_comparison_all,
-            "diameter_differences": diameter_comparison_all,
-            "total_difference": total_difference,
-        }
+    # Compare the average diameters with the corresponding diameters in the data
+    closest_filetype, comparison_results = registry.compare(average_diameters)
 
-        if total_difference < smallest_difference:
-            smallest_difference = total_difference
-            closest_filetype = file_type
+    # --- Append this run to the results store (ResultsStoreLib export rebuilds all_raw_results.csv) ---
+    folder_name = os.path.basename(os.path.normpath(input_directory))
+    with RSL.open_default_store() as store:
+        store.append(folder_name, average_diameters, closest_filetype)
 
     # Write the differences for all points to a text file
     output_file_path = os.path.join(input_directory, f"{closest_filetype}_diff.txt")
@@ -140,16 +82,36 @@ def MAIN(input_directory):
     
     plot_output_path = os.path.join(input_directory, f"{closest_filetype}_comparison_plot.png")
     plt.savefig(plot_output_path, dpi=300, bbox_inches="tight")  # Save the plot with high resolution
+    if PlotReady is not None:
+        # Screen-resolution copy straight from the Agg buffer
+        figure = plt.gcf()
+        figure.canvas.draw()
+        PlotReady(plot_output_path, np.array(figure.canvas.buffer_rgba()))
     plt.close()  # Close the plot to free memory
 
     return plot_output_path, closest_filetype
     
 
-def CalculateAllImages(input_directory):
-    
-    TopGaugeSize = 19.674
-    BottomGaugeSize = 10.381
-    RightGaugeSize = 7.608
+def AverageDiameters(results):
+    # Collect measured diameters from all images
+    all_measured_diameters = []
+    for result in results:
+        measured_diameters = result["MeasuredDs"][1]  # Extract measured diameters
+        all_measured_diameters.append(measured_diameters)
+
+    # Convert to a NumPy array for easier averaging
+    all_measured_diameters = np.array(all_measured_diameters)
+
+    return np.mean(all_measured_diameters, axis=0)
+
+def CalculateAllImages(input_directory, CalibrationMode="sweep", Layout=None, Workers=None, Plot=True, Frames=None):
+    # Workers: number of processes measuring images in parallel. None uses one per
+    # image up to the core count; 1 (or a single-core machine) runs serially.
+    # Plot=False skips the per-image *_measured.png render.
+    # Frames: [(name, image array or FrameArchiveLib.FrameRef), ...] measured as-is
+    # instead of reading the folder; each is treated as input_directory/<name>.bmp
+    # for the outputs. FrameRefs are mapped in the worker, so only the reference
+    # crosses the process pool.
     
     # Path to the StandardDimentions folder
     base_dir = "StandardDimentions"
@@ -158,39 +120,153 @@ def CalculateAllImages(input_directory):
 
 
 
-    bmp_files = checkFolder(input_directory)
-            
-    results = []
+    if Frames is None:
+        bmp_files = checkFolder(input_directory)
+        images = [None]*len(bmp_files)
+    else:
+        bmp_files = [os.path.join(input_directory, name + ".bmp") for name, _ in Frames]
+        images = [image for _, image in Frames]
 
-    for ImagePath in bmp_files:
-        image_name = os.path.splitext(os.path.basename(ImagePath))[0]
-        PixelSize,VerticalScale,Threshold,LaseError = CalibrateImage(ImagePath,TopGaugeSize,BottomGaugeSize,RightGaugeSize)
-    
-        file_x, file_y,_ = FindContour(ImagePath,Threshold)
-        y_smooth = ReduceYNoise(file_x, file_y)
-        y_CenterLine,coefficients = FitCenterLine(file_x,y_smooth)
-        theta_degrees, x_TipLong, y_TipLong, x_TipShort, y_TipShort = TipInformation(file_x, y_smooth)
-        Tip = [x_TipLong, y_TipLong, x_TipShort, y_TipShort]
+    cores = os.cpu_count() or 1
+    if Workers is None:
+        Workers = cores
+    Workers = max(1, min(Workers, len(bmp_files), cores))
+
+    if Workers == 1:
+        if Layout is None and CalibrationMode == "search":
+            Layout = SharedROILayout()
+        return [ProcessImage(ImagePath, CalibrationMode, Layout, Plot, Image) for ImagePath, Image in zip(bmp_files, images)]
+
+    # map keeps the results in bmp_files order
+    pool = GetProcessPool(Workers)
+    count = len(bmp_files)
+    return list(pool.map(ProcessImage, bmp_files, [CalibrationMode]*count, [Layout]*count, [Plot]*count, images))
+
+def ProcessImage(ImagePath, CalibrationMode="sweep", Layout=None, Plot=True, Image=None):
+    # Calibrate, measure and plot one image. Images are independent, so this is
+    # also the unit of work the process pool runs. Image, when given, is the
+    # already decoded frame and ImagePath only names the outputs.
     
-        Standard_Distances = np.arange(0, 17, 1)
-        MeasuredDs = CalDias(Standard_Distances, file_x, file_y, PixelSize, VerticalScale)
-        results.append({"image_name": image_name, "MeasuredDs": MeasuredDs})
-        plot_image_with_data(ImagePath, file_x, file_y, MeasuredDs)
+    TopGaugeSize = 19.674
+    BottomGaugeSize = 10.381
+    RightGaugeSize = 7.608
+
+    if Layout is None and CalibrationMode == "search":
+        Layout = SharedROILayout()
+
+    image_name = os.path.splitext(os.path.basename(ImagePath))[0]
+    if isinstance(Image, FrameArchiveLib.FrameRef):
+        Image = Image.view() # zero-copy view of the memory-mapped archive
+    Context = ImageContext(ImagePath, Image) # decode once, shared by every stage below
+    PixelSize,VerticalScale,Threshold,LaseError = CalibrateImageContext(Context,TopGaugeSize,BottomGaugeSize,RightGaugeSize,CalibrationMode,Layout)
+
+    # Same contour and geometry CalibrateImage already built for the best threshold
+    Geometry = Context.file_geometry(Threshold,PixelSize,Layout)
+    file_x, file_y = Geometry.x, Geometry.y
+    theta_degrees, x_TipLong, y_TipLong, x_TipShort, y_TipShort = Geometry.tip
+    Tip = [x_TipLong, y_TipLong, x_TipShort, y_TipShort]
 
-    return results
+    Standard_Distances = np.arange(0, 17, 1)
+    MeasuredDs = CalDias(Standard_Distances, file_x, file_y, PixelSize, VerticalScale, Geometry)
+    if Plot:
+        plot_image_context_with_data(Context, file_x, file_y, MeasuredDs)
+
+    return {"image_name": image_name, "MeasuredDs": MeasuredDs}
+
+_process_pool = None
+_process_pool_workers = 0
+
+def GetProcessPool(Workers):
+    # One pool per process, reused across batches so workers pay the cv2/scipy import only once
+    global _process_pool, _process_pool_workers
+    if _process_pool is not None and _process_pool_workers != Workers:
+        _process_pool.shutdown(wait=True)
+        _process_pool = None
+    if _process_pool is None:
+        OpenCVThreads = max(1, (os.cpu_count() or 1) // Workers)
+        _process_pool = ProcessPoolExecutor(max_workers=Workers, initializer=InitWorkerProcess, initargs=(OpenCVThreads,))
+        _process_pool_workers = Workers
+    return _process_pool
+
+def InitWorkerProcess(OpenCVThreads):
+    # Split the cores between workers instead of letting every worker's OpenCV use all of them
+    cv2.setNumThreads(OpenCVThreads)
+    plt.switch_backend("Agg") # workers only save figures
+
+class ImageContext:
+    """Decodes an image once and keeps its grayscale and colour planes.
+
+    CalibrateImage, FindContour and plot_image_with_data each used to call
+    cv2.imread on the same BMP; passing one context through the pipeline
+    keeps that to a single decode per image.
+    """
+
+    def __init__(self, ImagePath, image=None):
+        self.path = ImagePath
+        if image is None:
+            image = FrameLib.read_image(ImagePath)
+            if image is None:
+                raise FileNotFoundError(f"Could not read image {ImagePath}")
+
+        if image.ndim == 2:
+            self.gray = image
+            self._color = None
+        else:
+            if image.shape[2] == 4:
+                image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+            self._color = image
+            self.gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        self._file_contours = {} # threshold -> (x, y, file_index)
+        self._geometries = {} # threshold -> ContourGeometry
+
+    @property
+    def color(self):
+        # Mono cameras give a single plane; expand it only when a stage needs BGR
+        if self._color is None:
+            self._color = cv2.cvtColor(self.gray, cv2.COLOR_GRAY2BGR)
+        return self._color
+
+    @property
+    def name(self):
+        return os.path.basename(self.path) if self.path else ""
+
+    def file_geometry(self, Threshold, PixelSize=None, Layout=None):
+        # ContourGeometry of the file contour at Threshold, built once per image
+        if Threshold not in self._geometries:
+            file_x, file_y, _ = FindContourContext(self, Threshold, Layout)
+            self._geometries[Threshold] = ContourGeometry(file_x, file_y, PixelSize)
+        return self._geometries[Threshold]
+
+    def masked_gray(self, left, right, top, bottom):
+        # Copy of the grayscale plane with the jig borders painted white
+        GrayscaleImage = self.gray.copy()
+        GrayscaleImage[0:,0:left]=255 # L side of image
+        GrayscaleImage[0:,-right:]=255 # R side of image
+        GrayscaleImage[0:top,0:]=255 # T side of image
+        GrayscaleImage[-bottom:,0:]=255 # B side of image
+        return GrayscaleImage
+
+def as_image_context(image):
+    if isinstance(image, ImageContext):
+        return image
+    return ImageContext(image)
 
 def plot_image_with_data(ImagePath, file_x, file_y, MeasuredDs):
+    plot_image_context_with_data(as_image_context(ImagePath), file_x, file_y, MeasuredDs)
 
+def plot_image_context_with_data(Context, file_x, file_y, MeasuredDs):
+
+    ImagePath = Context.path
     CenterPoints = MeasuredDs[0]
     Intersection_U = MeasuredDs[4]
     Intersection_D = MeasuredDs[5]
     xMax, yMax = MeasuredDs[6][:, 0], MeasuredDs[6][:, 1]
     xMin, yMin = MeasuredDs[7][:, 0], MeasuredDs[7][:, 1]
 
-    # Read and display the image
-    ImageCopy = cv2.imread(ImagePath)  # Read the image
+    # Display the already decoded image
     plt.figure(figsize=(10, 6))
-    plt.imshow(cv2.cvtColor(ImageCopy, cv2.COLOR_BGR2RGB))  # Convert BGR to RGB for Matplotlib
+    plt.imshow(cv2.cvtColor(Context.color, cv2.COLOR_BGR2RGB))  # Convert BGR to RGB for Matplotlib
 
     # Plot the contour
     plt.plot(file_x, file_y, label="Contour", color="blue", linewidth=1)
@@ -210,7 +286,7 @@ def plot_image_with_data(ImagePath, file_x, file_y, MeasuredDs):
     plt.scatter(xMin, yMin, color="cyan", label="Minima", marker="*", s=5, zorder=5)
 
     # Add labels and legend
-    plt.title(f"Image: {os.path.basename(ImagePath)}")
+    plt.title(f"Image: {Context.name}")
     plt.xlabel("X")
     plt.ylabel("Y")
     plt.legend()
@@ -287,24 +363,29 @@ def checkFolder(input_directory):
             print("Directory is empty")
             sys.exit()
 
-    bmp_files = [os.path.join(input_directory,filename) for filename in os.listdir(input_directory) if (filename.lower().endswith('.bmp') )]
+    # BMP from the camera, or any of the compressed archive formats (FrameLib.ARCHIVE_FORMATS),
+    # but not the plots an earlier MAIN run left in the folder
+    bmp_files = [os.path.join(input_directory,filename) for filename in FrameLib.list_frames(input_directory)]
     return bmp_files
 
-def CalDias(Standard_Distances, file_x, file_y, PixelSize, VerticalScale):
+def CalDias(Standard_Distances, file_x, file_y, PixelSize, VerticalScale, Geometry=None):
 
     Standard_Distances = np.arange(0, 17, 1)
 
+    if Geometry is None:
+        Geometry = ContourGeometry(file_x, file_y, PixelSize)
+
     #Smooth the y values to reduce noise
-    y_smooth = ReduceYNoise(file_x, file_y)
+    y_smooth = Geometry.y_smooth
 
     #fit a center line through x and y points
-    y_CenterLine,coefficients = FitCenterLine(file_x,y_smooth)
+    y_CenterLine,coefficients = Geometry.center_line
 
     #find the information of tip
-    theta_degrees, x_TipLong, y_TipLong, x_TipShort, y_TipShort = TipInformation(file_x, y_smooth)
-    TipPixels,TipDiameter = CalculateTipDiameter(file_x,y_smooth,x_TipShort,y_TipShort,PixelSize)
+    theta_degrees, x_TipLong, y_TipLong, x_TipShort, y_TipShort = Geometry.tip
+    TipPixels,TipDiameter = Geometry.tip_diameter
     
-    xMax, yMax, xMin, yMin = FindLocalMaxMin(file_x, y_smooth,y_CenterLine,PixelSize)
+    xMax, yMax, xMin, yMin = Geometry.extrema
     
     leng = len(Standard_Distances)
     
@@ -316,12 +397,9 @@ def CalDias(Standard_Distances, file_x, file_y, PixelSize, VerticalScale):
     CenterPoints = []
     
     # Tip
-    x_tip_index = np.argmax(file_x)
-    y_tip_index = np.argmax(file_x)       
-    x_tip = file_x[x_tip_index]
-    y_tip = y_CenterLine[y_tip_index]
+    x_tip, y_tip = Geometry.tip_point
     
-    D_tip_NewMethod, IntersectMax_NewMethod, IntersectMin_NewMethod = CalTipDiaFromMinMaxPoints(file_x, file_y, PixelSize, VerticalScale)
+    D_tip_NewMethod, IntersectMax_NewMethod, IntersectMin_NewMethod = CalTipDiaFromMinMaxPoints(file_x, file_y, PixelSize, VerticalScale, Geometry)
     
     Measured_Diameters.append(D_tip_NewMethod)
     Measured_Diameters_U.append(D_tip_NewMethod/2)
@@ -339,8 +417,6 @@ def CalDias(Standard_Distances, file_x, file_y, PixelSize, VerticalScale):
 
         XnCenter,YnCenter = XnY_OnCenterLine(x_tip, y_tip, y_CenterLine, coefficients, DistanceFromTip, PixelSize)
         
-        find_UpperLowerPoints(xMax, yMax, XnCenter, YnCenter, coefficients[0], coefficients[1])
-        
         lower_point_Max,upper_point_Max = find_UpperLowerPoints(xMax, yMax, XnCenter, YnCenter, coefficients[0], coefficients[1])
         lower_point_Min,upper_point_Min = find_UpperLowerPoints(xMin, yMin, XnCenter, YnCenter, coefficients[0], coefficients[1])
         
@@ -411,7 +487,7 @@ def PrintResults(ImagePath, theta_degrees, Standard_Distances, Standard_Diameter
             
 def PlotResults(ImagePath, file_x, file_y,Tip, Results, PixelSize, VerticalScale):
     
-    ImageCopy = cv2.imread(ImagePath) #make a copy of the original image
+    ImageCopy = as_image_context(ImagePath).color
     plt.figure(figsize=[6016/96,4016/96], dpi=96)
     plt.axes([0, 0, 1, 1], frameon=False)
     plt.imshow(ImageCopy[:,:,::-1])
@@ -516,19 +592,23 @@ def FindContoursIndex(contours):
 
     return TopGauge_Index, BottomGauge_Index, VerticalGauge_Index, File_Index
    
-def CalibrateImage(ImagePath,TopRealSize,BottomRealSize,RightRealSize):
+def CalibrateImage(ImagePath,TopRealSize,BottomRealSize,RightRealSize,Mode="sweep",Layout=None):
+    return CalibrateImageContext(as_image_context(ImagePath),TopRealSize,BottomRealSize,RightRealSize,Mode,Layout)
+
+def CalibrateImageContext(Context,TopRealSize,BottomRealSize,RightRealSize,Mode="sweep",Layout=None):
+    # Mode "sweep" tries every threshold in range(90,190,5) on the full frame.
+    # Mode "search" runs a golden-section search over the same grid and only
+    # evaluates the gauge windows of Layout (learned on its first full-frame
+    # pass when not given). Layout also restricts the final file contour.
+    # Search is opt-in: it assumes one minimum of the gauge error across
+    # thresholds, which does not always hold, so "sweep" stays the default.
     
     LW = 17
     DW = 1.2
 
-    GrayscaleImage = cv2.imread(ImagePath,0) #0 means read in grayscale
+    GrayscaleImage = Context.masked_gray(200, 50, 400, 400)
     # GrayscaleImage = cv2.flip(GrayscaleImage, 0)
 
-    GrayscaleImage[0:,0:200]=255 # L side of image
-    GrayscaleImage[0:,-50:]=255 # R side of image
-    GrayscaleImage[0:400,0:]=255 # T side of image
-    GrayscaleImage[-400:,0:]=255 # B side of image
-
     # img_resized = cv2.resize(GrayscaleImage, (800, 600))
     # cv2.imshow('image',img_resized)
     # cv2.waitKey(0)
@@ -538,59 +618,52 @@ def CalibrateImage(ImagePath,TopRealSize,BottomRealSize,RightRealSize):
     VError = LastError
     PixelSize = 4
     
-    for threshold in range(90,190,5):
-        
-        ret, thresh = cv2.threshold(GrayscaleImage, threshold, 255, 0)
-        contours, hierarchy = cv2.findContours(thresh, cv2.RETR_LIST  , cv2.CHAIN_APPROX_NONE)
-        
-        top_index,bottom_index,right_index,file_index = FindContoursIndex(contours)
-        
-        # ImageCopy = cv2.imread(ImagePath)
-        # ImageCopy = cv2.flip(ImageCopy, 0)
-        # cv2.drawContours(ImageCopy, contours, file_index, (255, 0, 0),50)
-        # cv2.drawContours(ImageCopy, contours, top_index, (0, 255, 0),50)
-        # cv2.drawContours(ImageCopy, contours, bottom_index, (0, 0, 255),50)
-        # cv2.drawContours(ImageCopy, contours, right_index, (0, 255, 255),50)
-        # plt.figure(figsize=[6016/96,4016/96])
-        # plt.imshow(ImageCopy[:,:,::-1])
-        # plt.axis('off')
-        
-        top = contours[top_index]
-        top_Leftmost = tuple(top[top[:, :, 0].argmin()][0])
-        top_Rightmost = tuple(top[top[:, :, 0].argmax()][0])
-        topPixelLength = distance(top_Leftmost[0],top_Leftmost[1],top_Rightmost[0],top_Rightmost[1])
-        
-        bottom = contours[bottom_index]
-        bottom_Leftmost = tuple(bottom[bottom[:, :, 0].argmin()][0])
-        bottom_Rightmost = tuple(bottom[bottom[:, :, 0].argmax()][0])
-        bottomPixelLength = distance(bottom_Leftmost[0],bottom_Leftmost[1],bottom_Rightmost[0],bottom_Rightmost[1])
-        
-        right = contours[right_index]
-        right_North = tuple(right[right[:, :, 1].argmin()][0])
-        right_South = tuple(right[right[:, :, 1].argmax()][0])
-        rightPixelLength = distance(right_North[0],right_North[1],right_South[0],right_South[1])
-        
-        PixelSizeFromTop = TopRealSize/topPixelLength
-        BottomSizeBasedOnTopPixelSize = PixelSizeFromTop*bottomPixelLength
-        RightSizeBasedOnTopPixelSize = PixelSizeFromTop*rightPixelLength
-        
-        Error = (BottomSizeBasedOnTopPixelSize-BottomRealSize)*1000 #this number is in micromiters
-        VerticalError = (RightSizeBasedOnTopPixelSize-RightRealSize)*1000 #this number is in micromiters
-        
+    if Mode == "search":
+        threshold, Error, VerticalError, PixelSizeFromTop = SearchBestThreshold(GrayscaleImage, range(90,190,5), TopRealSize, BottomRealSize, RightRealSize, Layout)
         if abs(Error)<abs(LastError):
             BestThreshold = threshold
             LastError = Error
             VError = VerticalError
             PixelSize = PixelSizeFromTop*1000
+    elif Mode == "sweep":
+        for threshold in range(90,190,5):
+        
+            ret, thresh = cv2.threshold(GrayscaleImage, threshold, 255, 0)
+            contours, hierarchy = cv2.findContours(thresh, cv2.RETR_LIST  , cv2.CHAIN_APPROX_NONE)
+        
+            top_index,bottom_index,right_index,file_index = FindContoursIndex(contours)
+        
+            # ImageCopy = cv2.imread(ImagePath)
+            # ImageCopy = cv2.flip(ImageCopy, 0)
+            # cv2.drawContours(ImageCopy, contours, file_index, (255, 0, 0),50)
+            # cv2.drawContours(ImageCopy, contours, top_index, (0, 255, 0),50)
+            # cv2.drawContours(ImageCopy, contours, bottom_index, (0, 0, 255),50)
+            # cv2.drawContours(ImageCopy, contours, right_index, (0, 255, 255),50)
+            # plt.figure(figsize=[6016/96,4016/96])
+            # plt.imshow(ImageCopy[:,:,::-1])
+            # plt.axis('off')
+        
+            top = contours[top_index]
+            bottom = contours[bottom_index]
+            right = contours[right_index]
+            Error, VerticalError, PixelSizeFromTop = GaugeErrors(top, bottom, right, TopRealSize, BottomRealSize, RightRealSize)
+        
+            if abs(Error)<abs(LastError):
+                BestThreshold = threshold
+                LastError = Error
+                VError = VerticalError
+                PixelSize = PixelSizeFromTop*1000
+    else:
+        raise ValueError(f"Unknown calibration mode: {Mode}")
               
-    #     print("Th = ",threshold,"\t","H_Error = ","{:.2f}".format(Error),"\t","V_Error = ","{:.2f}".format(VerticalError))
+    #         print("Th = ",threshold,"\t","H_Error = ","{:.2f}".format(Error),"\t","V_Error = ","{:.2f}".format(VerticalError))
     # print("---------------------")
     
     
 
-    file_x, file_y, file_index = FindContour(ImagePath,BestThreshold)
-    y_smooth = ReduceYNoise(file_x, file_y)
-    y_CenterLine,coefficients = FitCenterLine(file_x,y_smooth)
+    Geometry = Context.file_geometry(BestThreshold,PixelSize,Layout)
+    file_x, file_y = Geometry.x, Geometry.y
+    y_CenterLine,coefficients = Geometry.center_line
     slope, intercept = coefficients
     
 
@@ -631,25 +704,241 @@ def CalibrateImage(ImagePath,TopRealSize,BottomRealSize,RightRealSize):
 
     return PixelSize, VerticalScaling, BestThreshold, LastError
 
-def FindContour(ImagePath,Threshold):
-    GrayscaleImage = cv2.imread(ImagePath,0) #0 means read in grayscale
+def GaugeErrors(top, bottom, right, TopRealSize, BottomRealSize, RightRealSize):
+    # Horizontal and vertical gauge errors (microns) with the pixel size taken from the top gauge
+    top_Leftmost = tuple(top[top[:, :, 0].argmin()][0])
+    top_Rightmost = tuple(top[top[:, :, 0].argmax()][0])
+    topPixelLength = distance(top_Leftmost[0],top_Leftmost[1],top_Rightmost[0],top_Rightmost[1])
+    
+    bottom_Leftmost = tuple(bottom[bottom[:, :, 0].argmin()][0])
+    bottom_Rightmost = tuple(bottom[bottom[:, :, 0].argmax()][0])
+    bottomPixelLength = distance(bottom_Leftmost[0],bottom_Leftmost[1],bottom_Rightmost[0],bottom_Rightmost[1])
+    
+    right_North = tuple(right[right[:, :, 1].argmin()][0])
+    right_South = tuple(right[right[:, :, 1].argmax()][0])
+    rightPixelLength = distance(right_North[0],right_North[1],right_South[0],right_South[1])
+    
+    PixelSizeFromTop = TopRealSize/topPixelLength
+    BottomSizeBasedOnTopPixelSize = PixelSizeFromTop*bottomPixelLength
+    RightSizeBasedOnTopPixelSize = PixelSizeFromTop*rightPixelLength
+    
+    Error = (BottomSizeBasedOnTopPixelSize-BottomRealSize)*1000 #this number is in micromiters
+    VerticalError = (RightSizeBasedOnTopPixelSize-RightRealSize)*1000 #this number is in micromiters
+    return Error, VerticalError, PixelSizeFromTop
+
+def PaddedROI(contour, shape, pad=50):
+    # Bounding box of a contour grown by pad pixels and clipped to the image, as (x0, y0, x1, y1)
+    x, y, w, h = cv2.boundingRect(contour)
+    return (max(x-pad,0), max(y-pad,0), min(x+w+pad,shape[1]), min(y+h+pad,shape[0]))
+
+def FindContourInROI(GrayscaleImage, threshold, roi, ExpectedArea=None, AreaTolerance=0.25):
+    # Largest closed contour inside the ROI, in full-image coordinates.
+    # Returns None when the ROI check fails (object touches the window or its
+    # area moved too far from ExpectedArea) so the caller can rescan the frame.
+    # ExpectedArea=None skips the area check, e.g. for hand-configured windows.
+    x0, y0, x1, y1 = roi
+    ret, thresh = cv2.threshold(GrayscaleImage[y0:y1,x0:x1], threshold, 255, 0)
+    contours, hierarchy = cv2.findContours(thresh, cv2.RETR_LIST  , cv2.CHAIN_APPROX_NONE)
+    
+    height, width = thresh.shape
+    best = None
+    best_area = 0
+    for cnt in contours:
+        bx, by, bw, bh = cv2.boundingRect(cnt)
+        if bx == 0 or by == 0 or bx+bw >= width or by+bh >= height:
+            continue # the window border itself, or an object cut by the window
+        area = cv2.contourArea(cnt)
+        if area > best_area:
+            best = cnt
+            best_area = area
+    
+    if best is None:
+        return None
+    if ExpectedArea is not None and abs(best_area-ExpectedArea) > AreaTolerance*ExpectedArea:
+        return None
+    return best + np.array([x0, y0], dtype=best.dtype)
+
+ROI_NAMES = ("top", "bottom", "right", "file") # same order FindContoursIndex returns
+GAUGE_NAMES = ROI_NAMES[:3]
+ROI_LAYOUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "roi_layout.json")
+
+class ROILayout:
+    """Padded windows around the three gauges and the file.
+
+    The jig is fixed, so once a full-frame FindContoursIndex pass has located
+    the objects, later thresholds and later shots only threshold and trace
+    contours inside these windows. Any failed ROI check rescans the full
+    frame and relearns the windows. Windows can also be loaded from a JSON
+    file instead of being learned.
+    """
+
+    def __init__(self, rois=None, areas=None, pad=50, pads=None):
+        self.rois = {name: tuple(roi) for name, roi in (rois or {}).items()}
+        self.areas = dict(areas or {})
+        self.pad = pad
+        self.pads = {"file": 300} if pads is None else dict(pads) # the file tip moves with the file length
+        self.timings = {}  # name -> seconds spent on the last extraction, "full_frame" for rescans
+        self.full_frame_scans = 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            config = json.load(f)
+        return cls(config.get("rois"), config.get("areas"), config.get("pad", 50), config.get("pads"))
+
+    def save(self, path):
+        config = {"rois": {name: list(roi) for name, roi in self.rois.items()},
+                  "areas": self.areas, "pad": self.pad, "pads": self.pads}
+        with open(path, "w") as f:
+            json.dump(config, f, indent=2)
+
+    def learn(self, contours, indexes, shape):
+        for name, index in zip(ROI_NAMES, indexes):
+            self.rois[name] = PaddedROI(contours[index], shape, self.pads.get(name, self.pad))
+            self.areas[name] = float(cv2.contourArea(contours[index]))
+
+    def extract(self, GrayscaleImage, threshold, names=ROI_NAMES):
+        # Contours of the requested objects in full-image coordinates, keyed by name
+        found = {}
+        if all(name in self.rois for name in names):
+            for name in names:
+                start = time.perf_counter()
+                found[name] = FindContourInROI(GrayscaleImage, threshold, self.rois[name], self.areas.get(name))
+                self.timings[name] = time.perf_counter() - start
+                if found[name] is None:
+                    break
+            if len(found) == len(names) and all(found[name] is not None for name in names):
+                return found
+
+        start = time.perf_counter()
+        ret, thresh = cv2.threshold(GrayscaleImage, threshold, 255, 0)
+        contours, hierarchy = cv2.findContours(thresh, cv2.RETR_LIST  , cv2.CHAIN_APPROX_NONE)
+        indexes = FindContoursIndex(contours)
+        self.learn(contours, indexes, GrayscaleImage.shape)
+        self.timings["full_frame"] = time.perf_counter() - start
+        self.full_frame_scans += 1
+        return {name: contours[index] for name, index in zip(ROI_NAMES, indexes) if name in names}
+
+    def pixel_count(self):
+        return sum((x1-x0)*(y1-y0) for x0, y0, x1, y1 in self.rois.values())
+
+    def timing_report(self):
+        lines = [f"{name}: {seconds*1000:.2f} ms" for name, seconds in self.timings.items()]
+        lines.append(f"ROI pixels: {self.pixel_count()}, full-frame scans: {self.full_frame_scans}")
+        return "\n".join(lines)
+
+_shared_layout = None
+
+def SharedROILayout():
+    # Process-wide layout, seeded from roi_layout.json when present and otherwise learned on first use
+    global _shared_layout
+    if _shared_layout is None:
+        if os.path.exists(ROI_LAYOUT_FILE):
+            _shared_layout = ROILayout.load(ROI_LAYOUT_FILE)
+        else:
+            _shared_layout = ROILayout()
+    return _shared_layout
+
+def SearchBestThreshold(GrayscaleImage, thresholds, TopRealSize, BottomRealSize, RightRealSize, Layout=None):
+    # Golden-section search for the threshold with the smallest |horizontal gauge error|.
+    # Assumes the error is unimodal over the grid; ties go to the lower threshold like the sweep.
+    thresholds = list(thresholds)
+    if Layout is None:
+        Layout = ROILayout()
+    evaluated = {}
+    
+    def evaluate(i):
+        if i not in evaluated:
+            gauges = Layout.extract(GrayscaleImage, thresholds[i], GAUGE_NAMES)
+            evaluated[i] = GaugeErrors(gauges["top"], gauges["bottom"], gauges["right"], TopRealSize, BottomRealSize, RightRealSize)
+        return abs(evaluated[i][0])
+    
+    invphi = (math.sqrt(5) - 1) / 2
+    lo, hi = 0, len(thresholds) - 1
+    while hi - lo > 2:
+        m1 = lo + int((hi - lo) * (1 - invphi))
+        m2 = lo + int(math.ceil((hi - lo) * invphi))
+        if evaluate(m1) <= evaluate(m2):
+            hi = m2
+        else:
+            lo = m1
     
-    GrayscaleImage[0:,0:300]=255 # L side of image
-    GrayscaleImage[0:,-200:]=255 # R side of image
-    GrayscaleImage[0:400,0:]=255 # T side of image
-    GrayscaleImage[-400:,0:]=255 # T side of image
+    best = min(range(lo, hi + 1), key=lambda i: (evaluate(i), i))
+    Error, VerticalError, PixelSizeFromTop = evaluated[best]
+    return thresholds[best], Error, VerticalError, PixelSizeFromTop
 
-    ret, thresh = cv2.threshold(GrayscaleImage, Threshold, 255, 0)
-    contours, hierarchy = cv2.findContours(thresh, cv2.RETR_LIST  , cv2.CHAIN_APPROX_NONE)
+def FindContour(ImagePath,Threshold,Layout=None):
+    return FindContourContext(as_image_context(ImagePath),Threshold,Layout)
+
+def FindContourContext(Context,Threshold,Layout=None):
+    # CalibrateImage and CalculateAllImages both ask for the best threshold's contour
+    if Threshold in Context._file_contours:
+        return Context._file_contours[Threshold]
+
+    GrayscaleImage = Context.masked_gray(300, 200, 400, 400)
+
+    if Layout is not None:
+        # file_index is None here: the contour comes from the file window, not a full-frame list
+        file = Layout.extract(GrayscaleImage, Threshold, ("file",))["file"][:,0,:]
+        file_index = None
+    else:
+        ret, thresh = cv2.threshold(GrayscaleImage, Threshold, 255, 0)
+        contours, hierarchy = cv2.findContours(thresh, cv2.RETR_LIST  , cv2.CHAIN_APPROX_NONE)
 
-    _,_,_,file_index = FindContoursIndex(contours)    
+        _,_,_,file_index = FindContoursIndex(contours)    
 
-    file=contours[file_index][:,0,:] #extract a numpy array of file contour coordinate points 
+        file=contours[file_index][:,0,:] #extract a numpy array of file contour coordinate points 
     x=file[:,0] #extract x values from numpy array of file contour coordinate points 
     y=file[:,1] #extract y values from numpy array of file contour coordinate points
     
+    Context._file_contours[Threshold] = (x,y,file_index)
     return x,y,file_index
 
+class ContourGeometry:
+    """Smoothed y, centre line, tip data and extrema of one file contour.
+
+    Every quantity is computed on first use and then reused, so CalibrateImage,
+    CalDias and CalTipDiaFromMinMaxPoints share a single savgol/polyfit pass
+    instead of each redoing it. PixelSize is only needed by tip_diameter and
+    extrema.
+    """
+
+    def __init__(self, x, y, PixelSize=None):
+        self.x = x
+        self.y = y
+        self.PixelSize = PixelSize
+
+    @cached_property
+    def y_smooth(self):
+        return ReduceYNoise(self.x, self.y)
+
+    @cached_property
+    def center_line(self):
+        # (y_CenterLine, coefficients) as returned by FitCenterLine
+        return FitCenterLine(self.x, self.y_smooth)
+
+    @cached_property
+    def tip(self):
+        # (theta_degrees, x_TipLong, y_TipLong, x_TipShort, y_TipShort) as returned by TipInformation
+        return TipInformation(self.x, self.y_smooth)
+
+    @cached_property
+    def tip_point(self):
+        # Tip x and the centre line y at the tip
+        tip_index = np.argmax(self.x)
+        return self.x[tip_index], self.center_line[0][tip_index]
+
+    @cached_property
+    def tip_diameter(self):
+        theta_degrees, x_TipLong, y_TipLong, x_TipShort, y_TipShort = self.tip
+        return CalculateTipDiameter(self.x, self.y_smooth, x_TipShort, y_TipShort, self.PixelSize)
+
+    @cached_property
+    def extrema(self):
+        # (xMax, yMax, xMin, yMin) as returned by FindLocalMaxMin
+        y_CenterLine, coefficients = self.center_line
+        return FindLocalMaxMin(self.x, self.y_smooth, y_CenterLine, self.PixelSize, coefficients)
+
 def ReduceYNoise(x,y):
     y_smooth = savgol_filter(y, 30, 1)
     return y_smooth
@@ -721,9 +1010,10 @@ def TipInformation(x,y):
         
     return theta_degrees, x_TipLong, y_TipLong, x_TipShort, y_TipShort
 
-def FindLocalMaxMin(x, y,y_CenterLine,PixelSize):
+def FindLocalMaxMin(x, y,y_CenterLine,PixelSize,coefficients=None):
     
-    y_CenterLine, coefficients = FitCenterLine(x,y)
+    if coefficients is None:
+        y_CenterLine, coefficients = FitCenterLine(x,y)
     
     tip_index = np.argmax(x)
     x_tip = x[tip_index]
@@ -733,7 +1023,7 @@ def FindLocalMaxMin(x, y,y_CenterLine,PixelSize):
     OverFlute_tolerance = 1
     min_dist =40 
     
-    Max_info,Min_info = InitialMinMaxCal(x, y, min_dist, normal_tolerance)
+    Max_info,Min_info = InitialMinMaxCal(x, y, min_dist, normal_tolerance, coefficients)
     
     x_top = Max_info[0]
     y_top = Max_info[1]
@@ -801,9 +1091,13 @@ def FindLocalMaxMin(x, y,y_CenterLine,PixelSize):
     
     return x_localMax, y_localMax, x_localMin, y_localMin
 
-def InitialMinMaxCal(x, y, min_dist, tolerance):
+def InitialMinMaxCal(x, y, min_dist, tolerance, coefficients=None):
 
-    y_CenterLine, [m,b] = FitCenterLine(x,y)
+    if coefficients is None:
+        y_CenterLine, [m,b] = FitCenterLine(x,y)
+    else:
+        m, b = coefficients
+        y_CenterLine = m * x + b
     
     # Separate points above and below the line
     above = y > y_CenterLine
@@ -842,28 +1136,31 @@ def InitialMinMaxCal(x, y, min_dist, tolerance):
     return Top_info,Down_info
 
 def find_local_maxima(X, Y, DST, tolerance=1e-5, gap_threshold=40):
-    maxima = []
-    maxima_indices = []
+    # Vectorized form of the original per-point loop (kept as the reference in
+    # scripts/check_find_local_maxima.py): one shifted-slice comparison per neighbour offset j
+    # instead of a Python loop per point. A neighbour pair (i-j, i+j) is skipped when either
+    # side has an x gap above gap_threshold; otherwise Y[i] must not drop more than
+    # tolerance below either neighbour.
+    X = np.asarray(X)
+    Y = np.asarray(Y)
     n = len(Y)
-    
-    for i in range(DST, n - DST):
-        is_maxima = True
-        
-        for j in range(1, DST + 1):
-            # If gap_threshold is defined, check for disconnections
-            if gap_threshold is not None and (X[i] - X[i - j] > gap_threshold or X[i + j] - X[i] > gap_threshold):
-                continue  # Skip this neighbor due to a large gap
-            
-            # Allow some tolerance for "almost equal" points
-            if Y[i] < Y[i - j] - tolerance or Y[i] < Y[i + j] - tolerance:
-                is_maxima = False
-                break
-        
-        if is_maxima:
-            maxima.append(Y[i])
-            maxima_indices.append(i)
-    
-    return maxima_indices
+    if n - DST <= DST:
+        return []
+
+    centre = slice(DST, n - DST)
+    Xc = X[centre]
+    Yc = Y[centre]
+    is_maxima = np.ones(n - 2 * DST, dtype=bool)
+
+    for j in range(1, DST + 1):
+        X_before, X_after = X[DST - j:n - DST - j], X[DST + j:n - DST + j]
+        Y_before, Y_after = Y[DST - j:n - DST - j], Y[DST + j:n - DST + j]
+        lower = (Yc < Y_before - tolerance) | (Yc < Y_after - tolerance)
+        if gap_threshold is not None:
+            lower &= ~((Xc - X_before > gap_threshold) | (X_after - Xc > gap_threshold))
+        is_maxima &= ~lower
+
+    return (np.flatnonzero(is_maxima) + DST).tolist()
 
 def CreateSpline(x_points,y_points):
     # Sort the data by x_localMax
@@ -1037,18 +1334,30 @@ def MeasureD(x,y,Result_Max,Result_Min,TipDiameter,PixelSize):
     
     return Measured_Diameters,CenterPoints,np.array([Intersection1,Intersection2])
 
-def findIntersection(x1,y1,x2,y2):
-    long = len(x1)
-    short = len(x2)
+def findIntersection(x1,y1,x2,y2,chunk=4096):
+    # Closest pair between the sampled normal line (x1,y1) and the contour points (x2,y2).
+    # Same result as the original double loop (scripts/check_findIntersection.py keeps it as the
+    # reference): first minimum in (i, j) order, returned as [x1[i], y2[j]].
+    x1 = np.asarray(x1, dtype=np.float64)
+    y1 = np.asarray(y1, dtype=np.float64)
+    x2 = np.asarray(x2, dtype=np.float64)
+    y2 = np.asarray(y2, dtype=np.float64)
+    if len(x1) == 0 or len(x2) == 0:
+        raise ValueError("findIntersection needs at least one line point and one contour point")
+
     dmin = 1000
-    for i in range(long):
-        for j in range(short):
-            d = distance(x1[i],y1[i],x2[j],y2[j])
-            if(d<dmin):
-                dmin = d
-                i_Min = i
-                j_min = j
-                
+    i_Min = j_min = None
+    for start in range(0, len(x1), chunk):
+        stop = min(start + chunk, len(x1))
+        d = np.sqrt((x2[None, :] - x1[start:stop, None])**2 + (y2[None, :] - y1[start:stop, None])**2)
+        flat = np.argmin(d) # first occurrence, like the strict < in the loop
+        if d.flat[flat] < dmin:
+            dmin = d.flat[flat]
+            i_Min, j_min = np.unravel_index(flat, d.shape)
+            i_Min += start
+
+    if i_Min is None:
+        raise ValueError("No contour point within 1000 pixels of the normal line")
     return [x1[i_Min],y2[j_min]]
 
 def distance(x1,y1,x2,y2):
@@ -1267,23 +1576,18 @@ def normal_distance_PointToLine(point, coefs, PixelSize):
     distance = distance * PixelSize/1000
     return distance   
     
-def CalTipDiaFromMinMaxPoints(file_x, file_y, PixelSize, VerticalScale):
-    #Smooth the y values to reduce noise
-    y_smooth = ReduceYNoise(file_x, file_y)
+def CalTipDiaFromMinMaxPoints(file_x, file_y, PixelSize, VerticalScale, Geometry=None):
+    if Geometry is None:
+        Geometry = ContourGeometry(file_x, file_y, PixelSize)
 
     #fit a center line through x and y points
-    y_CenterLine,coefficients = FitCenterLine(file_x,y_smooth)
+    y_CenterLine,coefficients = Geometry.center_line
     CenterLineCoefs = coefficients
 
     #find the information of tip
-    theta_degrees, x_TipLong, y_TipLong, x_TipShort, y_TipShort = TipInformation(file_x, y_smooth)
-    TipPixels,TipDiameter = CalculateTipDiameter(file_x,y_smooth,x_TipShort,y_TipShort,PixelSize)
-    x_tip_index = np.argmax(file_x)
-    y_tip_index = np.argmax(file_x)       
-    x_tip = file_x[x_tip_index]
-    y_tip = y_CenterLine[y_tip_index]
+    x_tip, y_tip = Geometry.tip_point
     
-    xMax, yMax, xMin, yMin = FindLocalMaxMin(file_x, y_smooth,y_CenterLine,PixelSize)
+    xMax, yMax, xMin, yMin = Geometry.extrema
 
     xMax = xMax[-3:]
     yMax = yMax[-3:]
@@ -6,7 +6,19 @@ import CameraAppClass
 
 # Run the application
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    # --replay FOLDER [--ppm N]: drive the app from recorded frames instead of the camera (see CameraReplayLib)
+    import argparse
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--replay", action="append", default=None)
+    parser.add_argument("--ppm", type=float, default=20)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    options, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
     window = CameraAppClass.CameraApp()
+    if options.replay:
+        import CameraReplayLib
+        window.camera_worker.set_replay(CameraReplayLib.ReplayCamera(options.replay, options.ppm, jitter=options.jitter))
+        window.log_to_output(f"Replay mode: {options.replay} at {options.ppm} parts/min. Start Camera to begin.")
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
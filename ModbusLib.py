@@ -0,0 +1,388 @@
+"""Shared Modbus RTU session and batched PLC state snapshots.
+
+ModbusSession keeps one client open for the life of the application instead
+of connecting and closing per register. It reconnects with exponential
+backoff after a failure and serialises every transaction with a lock, since
+the RS485 bus carries one request at a time. It also works out once which
+keyword (unit/slave/device_id) the installed pymodbus expects.
+
+PLCReader reads a register map (by default the M501-M506 coils and the D0/D1
+holding registers) in as few contiguous requests as possible. The result is
+a timestamped PLCSnapshot, cached for max_age seconds.
+
+ResultPublisher writes result codes from a background thread, so a slow
+HMI never holds up the part cycle.
+"""
+import time
+import threading
+from collections import OrderedDict
+from inspect import signature
+from pymodbus.client import ModbusSerialClient
+from pymodbus.exceptions import ModbusException
+from FrameLib import LatencyStats
+
+SERIAL_SETTINGS = {
+    "port": "COM2",       # Confirm your COM port
+    "baudrate": 9600,     # Match HMI settings
+    "parity": "E",
+    "stopbits": 1,
+    "bytesize": 8,
+    "timeout": 3,
+}
+SLAVE_ID = 2              # HMI slave address
+S0_ADDRESS = 0            # result register written after each part
+
+
+class ModbusSession:
+    """Long-lived, thread-safe Modbus client with automatic reconnect."""
+
+    def __init__(self, client_factory=None, slave=SLAVE_ID, backoff_start=0.2, backoff_max=10.0, **settings):
+        self.settings = dict(SERIAL_SETTINGS, **settings)
+        self.client_factory = client_factory or (lambda: ModbusSerialClient(**self.settings))
+        self.slave = slave
+        self.backoff_start = backoff_start
+        self.backoff_max = backoff_max
+        self._lock = threading.RLock()
+        self._client = None
+        self._connected = False
+        self._unit_keyword = None
+        self._backoff = 0.0
+        self._next_attempt = 0.0
+        self.transactions = 0
+        self.failures = 0
+        self.reconnects = 0
+
+    @property
+    def connected(self):
+        return self._connected
+
+    def connect(self):
+        """Opens the port unless already open; inside a backoff window it returns False without trying."""
+        with self._lock:
+            if self._connected:
+                return True
+            if time.monotonic() < self._next_attempt:
+                return False
+            if self._client is None:
+                self._client = self.client_factory()
+                self._unit_keyword = self._resolve_unit_keyword(self._client)
+            try:
+                ok = bool(self._client.connect())
+            except Exception:
+                ok = False
+            if ok:
+                if self.transactions or self.failures:
+                    self.reconnects += 1
+                self._connected = True
+                self._backoff = 0.0
+            else:
+                self._schedule_retry()
+            return ok
+
+    def close(self):
+        with self._lock:
+            self._drop()
+            self._client = None
+
+    def _drop(self):
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+        self._connected = False
+
+    def _schedule_retry(self):
+        self._backoff = min(self.backoff_max, self._backoff * 2 if self._backoff else self.backoff_start)
+        self._next_attempt = time.monotonic() + self._backoff
+
+    @staticmethod
+    def _resolve_unit_keyword(client):
+        # pymodbus 2.x: unit=, 3.x: slave=, 3.10+: device_id=
+        try:
+            parameters = signature(client.read_holding_registers).parameters
+        except (TypeError, ValueError):
+            return None
+        for keyword in ("device_id", "slave", "unit"):
+            if keyword in parameters:
+                return keyword
+        return None
+
+    def execute(self, method, *args, slave=None, **kwargs):
+        """Runs client.<method>(*args, **kwargs) for slave (default self.slave) and returns the response.
+
+        Raises ConnectionError when the port cannot be opened and IOError on a
+        Modbus error response. A failed transaction drops the connection so the
+        next call reconnects.
+        """
+        with self._lock:
+            if not self.connect():
+                raise ConnectionError(f"Modbus connection failed on {self.settings.get('port')} (retrying in {self._next_attempt - time.monotonic():.1f} s)")
+            if self._unit_keyword is not None:
+                kwargs[self._unit_keyword] = self.slave if slave is None else slave
+            try:
+                response = getattr(self._client, method)(*args, **kwargs)
+            except (ModbusException, OSError) as e:
+                self.failures += 1
+                self._drop()
+                self._schedule_retry()
+                raise ConnectionError(f"Modbus {method} failed: {e}") from e
+            if response is None:
+                self.failures += 1
+                raise IOError(f"No response from {method}")
+            if hasattr(response, "isError") and response.isError():
+                self.failures += 1
+                raise IOError(f"Modbus {method} error: {response}")
+            self.transactions += 1
+            return response
+
+    def read_holding_registers(self, address, count=1, slave=None):
+        response = self.execute("read_holding_registers", address=address, count=count, slave=slave)
+        return [int(v) for v in response.registers[:count]]
+
+    def read_coils(self, address, count=1, slave=None):
+        response = self.execute("read_coils", address=address, count=count, slave=slave)
+        return [bool(v) for v in response.bits[:count]]
+
+    def write_register(self, address, value, slave=None):
+        value = int(value)
+        if not 0 <= value <= 0xFFFF:
+            raise ValueError(f"Value {value} out of range for single register (0..65535)")
+        self.execute("write_register", address=address, value=value, slave=slave)
+
+    def stats(self):
+        return {"connected": self._connected, "transactions": self.transactions, "failures": self.failures, "reconnects": self.reconnects}
+
+
+def tcp_client_factory(host="127.0.0.1", port=5020, timeout=3):
+    """client_factory for a Modbus TCP endpoint, e.g. the ModbusSimLib simulator."""
+    from pymodbus.client import ModbusTcpClient
+    return lambda: ModbusTcpClient(host, port=port, timeout=timeout)
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def get_session(**settings):
+    """Process-wide session for the HMI/PLC bus, created on first use."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = ModbusSession(**settings)
+        return _default_session
+
+
+# name, kind, address, type. Coils are M relays, holding registers are D registers.
+PLC_REGISTER_MAP = [
+    ("M501", "coil", 501, "bool"),
+    ("M502", "coil", 502, "bool"),
+    ("M503", "coil", 503, "bool"),
+    ("M504", "coil", 504, "bool"),
+    ("M505", "coil", 505, "bool"),
+    ("M506", "coil", 506, "bool"),
+    ("D0", "holding", 0, "uint16"),
+    ("D1", "holding", 1, "uint16"),
+]
+
+# Per-request limits from the Modbus spec
+_MAX_COUNT = {"coil": 2000, "holding": 125}
+
+
+def plan_reads(fields, max_gap=8):
+    """Groups fields into (kind, start, count, [fields]) requests.
+
+    Addresses of one kind closer than max_gap are merged into one request:
+    at 9600 baud a few unused registers cost far less than another round-trip.
+    """
+    requests = []
+    for kind in ("coil", "holding"):
+        group = sorted((f for f in fields if f[1] == kind), key=lambda f: f[2])
+        current = None
+        for field in group:
+            address = field[2]
+            if current is not None and address - (current[1] + current[2]) <= max_gap and address - current[1] < _MAX_COUNT[kind]:
+                current[2] = address - current[1] + 1
+                current[3].append(field)
+            else:
+                current = [kind, address, 1, [field]]
+                requests.append(current)
+    return [tuple(r) for r in requests]
+
+
+def _convert(value, kind):
+    if kind == "bool":
+        return bool(value)
+    if kind == "int16":
+        return value - 0x10000 if value >= 0x8000 else value
+    return int(value)
+
+
+class PLCSnapshot:
+    """Values read in one PLCReader pass, with the time they were read."""
+
+    def __init__(self, values, timestamp, seconds, requests):
+        self.values = values
+        self.timestamp = timestamp  # time.time() when the read finished
+        self.seconds = seconds  # bus time spent reading
+        self.requests = requests  # Modbus transactions used
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def age(self):
+        return time.time() - self.timestamp
+
+    def __repr__(self):
+        return f"PLCSnapshot({self.values}, {self.requests} request(s), {self.seconds * 1000:.0f} ms)"
+
+
+class PLCReader:
+    """Cached snapshots of a PLC register map read through a ModbusSession."""
+
+    def __init__(self, session=None, fields=PLC_REGISTER_MAP, max_age=0.5, max_gap=8):
+        self.session = session or get_session()
+        self.fields = list(fields)
+        self.max_age = max_age
+        self.plan = plan_reads(self.fields, max_gap)
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, max_age=None):
+        """Latest snapshot, read again when older than max_age seconds (default self.max_age; 0 forces a read)."""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            if self._snapshot is not None and self._snapshot.age() <= max_age:
+                return self._snapshot
+            self._snapshot = self.read()
+            return self._snapshot
+
+    def read(self):
+        start = time.perf_counter()
+        values = {}
+        for kind, address, count, fields in self.plan:
+            if kind == "coil":
+                data = self.session.read_coils(address, count)
+            else:
+                data = self.session.read_holding_registers(address, count)
+            for name, _, field_address, field_type in fields:
+                values[name] = _convert(data[field_address - address], field_type)
+        return PLCSnapshot(values, time.time(), time.perf_counter() - start, len(self.plan))
+
+
+class ResultPublisher:
+    """Delivers result codes to the HMI from a background thread.
+
+    publish() only queues the write, so measurement and capture never wait
+    on the bus. The outbox is bounded and keyed by register: a newer value
+    for a register that has not been delivered yet replaces the older one
+    (a stale result is useless to the PLC). Failed writes are retried with
+    exponential backoff until they succeed or are superseded. After each
+    delivery the optional reader takes a fresh snapshot. The callbacks run
+    on the publisher thread; an exception in one is reported (printed if it
+    comes from on_error) and the thread carries on:
+
+        on_delivered(address, value, latency_ms, snapshot or None)
+        on_error(message)
+    """
+
+    def __init__(self, session=None, reader=None, max_pending=16, backoff_start=0.2, backoff_max=5.0, on_delivered=None, on_error=None):
+        self.session = session or get_session()
+        self.reader = reader
+        self.max_pending = max_pending
+        self.backoff_start = backoff_start
+        self.backoff_max = backoff_max
+        self.on_delivered = on_delivered
+        self.on_error = on_error
+        self.latency = LatencyStats()
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.retries = 0
+        self._outbox = OrderedDict()  # address -> (value, enqueued_at), oldest first
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="plc-publisher", daemon=True)
+        self._thread.start()
+
+    def publish(self, value, address=S0_ADDRESS):
+        """Queues value for register address; returns immediately."""
+        value = int(value)
+        if not 0 <= value <= 0xFFFF:
+            raise ValueError(f"Value {value} out of range for single register (0..65535)")
+        with self._condition:
+            if address in self._outbox:
+                self.coalesced += 1
+                del self._outbox[address]  # re-queue at the back with the new value
+            elif len(self._outbox) >= self.max_pending:
+                self._outbox.popitem(last=False)
+                self.dropped += 1
+            self._outbox[address] = (value, time.perf_counter())
+            self._condition.notify()
+
+    def pending(self):
+        with self._condition:
+            return len(self._outbox)
+
+    def stop(self, timeout=None):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        backoff = 0.0
+        while True:
+            with self._condition:
+                while self._running and not self._outbox:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                address, (value, enqueued_at) = next(iter(self._outbox.items()))
+
+            try:
+                self.session.write_register(address, value)
+            except Exception as e:
+                self.retries += 1
+                backoff = min(self.backoff_max, backoff * 2 if backoff else self.backoff_start)
+                self._report_error(f"Write of {value} to register {address} failed, retrying in {backoff:.1f} s: {e}")
+                with self._condition:
+                    self._condition.wait(backoff)  # publish() or stop() wakes it early
+                continue
+            backoff = 0.0
+
+            with self._condition:
+                # Only forget it if no newer value arrived while writing
+                if self._outbox.get(address, (None, None))[1] == enqueued_at:
+                    del self._outbox[address]
+            latency_ms = (time.perf_counter() - enqueued_at) * 1000
+            self.latency.record(latency_ms)
+            self.delivered += 1
+
+            snapshot = None
+            if self.reader is not None:
+                try:
+                    snapshot = self.reader.snapshot(max_age=0)
+                except Exception as e:
+                    self._report_error(f"PLC snapshot after write failed: {e}")
+            if self.on_delivered is not None:
+                try:
+                    self.on_delivered(address, value, latency_ms, snapshot)
+                except Exception as e:
+                    self._report_error(f"on_delivered callback failed: {e}")
+
+    def _report_error(self, message):
+        # A failing callback must not take the publisher thread down with it
+        if self.on_error is None:
+            return
+        try:
+            self.on_error(message)
+        except Exception as e:
+            print(f"{message} (on_error callback failed: {e})")
+
+    def stats(self):
+        return {"delivered": self.delivered, "pending": self.pending(), "coalesced": self.coalesced,
+                "dropped": self.dropped, "retries": self.retries, "latency": self.latency.summary()}
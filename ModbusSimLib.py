@@ -0,0 +1,247 @@
+"""Local Modbus TCP simulator of the HMI/PLC for testing without hardware.
+
+It emulates the register map the application uses on unit 2:
+- coils, including M501-M506 at addresses 501-506
+- holding registers, including D0/D1 at 0/1
+- the S0 result register. The application writes S0 at holding address 0,
+  so it shares that address with D0, exactly as the real addressing does.
+
+It answers read coils (0x01), read holding registers (0x03), write single
+coil (0x05), write single register (0x06) and write multiple registers
+(0x10). It can inject:
+- the serial transfer time of a real RS485 bus at a given baud rate
+- extra latency and jitter
+- exception responses
+- dropped responses, which the client sees as timeouts
+
+Requests are handled one at a time, like a single RS485 bus. The server is
+written on socketserver, so it does not depend on the pymodbus server API.
+
+Usage: python ModbusSimLib.py [--port 5020] [--baudrate 9600] [--latency 0.01] [--error-rate 0.05] [--drop-rate 0.01]
+Point a ModbusSession at it with client_factory=ModbusLib.tcp_client_factory("127.0.0.1", 5020).
+"""
+import sys
+import time
+import struct
+import random
+import argparse
+import threading
+import socketserver
+
+READ_COILS = 0x01
+READ_HOLDING_REGISTERS = 0x03
+WRITE_SINGLE_COIL = 0x05
+WRITE_SINGLE_REGISTER = 0x06
+WRITE_MULTIPLE_REGISTERS = 0x10
+
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+SLAVE_DEVICE_FAILURE = 0x04
+GATEWAY_TARGET_FAILED = 0x0B
+
+_MBAP = struct.Struct(">HHHB")  # transaction id, protocol id, length, unit id
+
+
+class ModbusSimulator:
+    """Threaded Modbus TCP server holding one unit's coils and holding registers."""
+
+    def __init__(self, host="127.0.0.1", port=0, unit=2, coils=2048, registers=1024,
+                 baudrate=None, latency=0.0, jitter=0.0, error_rate=0.0, drop_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.unit = unit
+        self.coils = [False] * coils
+        self.registers = [0] * registers
+        self.baudrate = baudrate  # emulate RS485 transfer time when set
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self._random = random.Random(seed)
+        self._bus = threading.Lock()  # one transaction on the bus at a time
+        self._server = None
+        self._thread = None
+        self.requests = 0
+        self.injected_errors = 0
+        self.dropped = 0
+        self.writes = []  # (time.time(), address, value) of every holding register write
+
+    # --- register map helpers ---
+    def set_coil(self, address, value):
+        self.coils[address] = bool(value)
+
+    def set_register(self, address, value):
+        self.registers[address] = int(value) & 0xFFFF
+
+    # --- server lifecycle ---
+    def start(self):
+        simulator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                simulator._serve(self.request)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = Server((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="modbus-sim", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        return {"requests": self.requests, "injected_errors": self.injected_errors, "dropped": self.dropped, "writes": len(self.writes)}
+
+    # --- protocol ---
+    def _serve(self, sock):
+        while True:
+            header = _recv_exact(sock, _MBAP.size)
+            if header is None:
+                return
+            transaction, protocol, length, unit = _MBAP.unpack(header)
+            pdu = _recv_exact(sock, length - 1)
+            if pdu is None:
+                return
+
+            with self._bus:
+                self.requests += 1
+                response = self._respond(unit, pdu)
+                if response is None:
+                    continue  # dropped: the client times out
+                self._wait(len(pdu), len(response))
+            sock.sendall(_MBAP.pack(transaction, protocol, len(response) + 1, unit) + response)
+
+    def _wait(self, request_bytes, response_bytes):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.baudrate:
+            # RTU frame = unit + PDU + CRC, 11 bits per character (start, 8 data, parity, stop), plus 3.5 char gaps
+            characters = (request_bytes + 3) + (response_bytes + 3) + 7
+            delay += characters * 11 / self.baudrate
+        if delay > 0:
+            time.sleep(delay)
+
+    def _respond(self, unit, pdu):
+        function = pdu[0]
+        if unit != self.unit:
+            return _exception(function, GATEWAY_TARGET_FAILED)
+        if self.drop_rate and self._random.random() < self.drop_rate:
+            self.dropped += 1
+            return None
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.injected_errors += 1
+            return _exception(function, SLAVE_DEVICE_FAILURE)
+
+        try:
+            if function == READ_COILS:
+                address, count = struct.unpack(">HH", pdu[1:5])
+                bits = self.coils[address:address + count]
+                if not 1 <= count <= 2000 or len(bits) != count:
+                    return _exception(function, ILLEGAL_DATA_ADDRESS)
+                packed = bytearray((count + 7) // 8)
+                for i, bit in enumerate(bits):
+                    if bit:
+                        packed[i // 8] |= 1 << (i % 8)
+                return bytes([function, len(packed)]) + bytes(packed)
+
+            if function == READ_HOLDING_REGISTERS:
+                address, count = struct.unpack(">HH", pdu[1:5])
+                values = self.registers[address:address + count]
+                if not 1 <= count <= 125 or len(values) != count:
+                    return _exception(function, ILLEGAL_DATA_ADDRESS)
+                return bytes([function, 2 * count]) + struct.pack(f">{count}H", *values)
+
+            if function == WRITE_SINGLE_COIL:
+                address, value = struct.unpack(">HH", pdu[1:5])
+                if value not in (0x0000, 0xFF00):
+                    return _exception(function, ILLEGAL_DATA_VALUE)
+                if address >= len(self.coils):
+                    return _exception(function, ILLEGAL_DATA_ADDRESS)
+                self.coils[address] = value == 0xFF00
+                return pdu[:5]
+
+            if function == WRITE_SINGLE_REGISTER:
+                address, value = struct.unpack(">HH", pdu[1:5])
+                if address >= len(self.registers):
+                    return _exception(function, ILLEGAL_DATA_ADDRESS)
+                self.registers[address] = value
+                self.writes.append((time.time(), address, value))
+                return pdu[:5]
+
+            if function == WRITE_MULTIPLE_REGISTERS:
+                address, count, _ = struct.unpack(">HHB", pdu[1:6])
+                values = struct.unpack(f">{count}H", pdu[6:6 + 2 * count])
+                if address + count > len(self.registers):
+                    return _exception(function, ILLEGAL_DATA_ADDRESS)
+                self.registers[address:address + count] = values
+                now = time.time()
+                self.writes.extend((now, address + i, v) for i, v in enumerate(values))
+                return pdu[:5]
+        except struct.error:
+            return _exception(function, ILLEGAL_DATA_VALUE)
+
+        return _exception(function, ILLEGAL_FUNCTION)
+
+
+def _exception(function, code):
+    return bytes([function | 0x80, code])
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        try:
+            chunk = sock.recv(size - len(data))
+        except OSError:
+            return None
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Modbus TCP simulator of the HMI/PLC")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--unit", type=int, default=2)
+    parser.add_argument("--baudrate", type=int, default=None, help="emulate RS485 transfer time at this baud rate")
+    parser.add_argument("--latency", type=float, default=0.0, help="extra seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra random seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an exception")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of requests never answered")
+    parser.add_argument("--type", type=int, default=0, help="file type selection in D1 (0=SX .. 5=F3)")
+    args = parser.parse_args(argv)
+
+    simulator = ModbusSimulator(args.host, args.port, args.unit, baudrate=args.baudrate, latency=args.latency,
+                                jitter=args.jitter, error_rate=args.error_rate, drop_rate=args.drop_rate)
+    simulator.set_register(1, args.type)
+    simulator.start()
+    print(f"Modbus simulator listening on {simulator.host}:{simulator.port} (unit {simulator.unit}). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(5)
+            print(simulator.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Screen-resolution previews of captures and plots for the GUI.
+
+The graphicsView is a few hundred pixels wide, so loading a 6016x4016
+capture or a 300-dpi plot into a full-size QPixmap wastes memory and time.
+make_preview shrinks with cv2.INTER_AREA. PreviewCache keeps recent previews
+keyed by path, mtime and size, so showing the same file again costs nothing.
+"""
+import os
+import threading
+from collections import OrderedDict
+import cv2
+import FrameLib
+
+PREVIEW_SIZE = (1600, 1200)  # (width, height) bound of a preview
+
+
+def make_preview(image, max_size=PREVIEW_SIZE):
+    """Returns (preview, scale): image shrunk to fit max_size (never enlarged) and full width / preview width."""
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    height, width = image.shape[:2]
+    factor = min(max_size[0] / width, max_size[1] / height, 1.0)
+    if factor >= 1.0:
+        return image, 1.0
+    size = (max(1, int(round(width * factor))), max(1, int(round(height * factor))))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), width / size[0]
+
+
+def load_full(path):
+    """Full-resolution image for zooming in (alpha dropped like make_preview); raises IOError if unreadable."""
+    image = FrameLib.read_image(path)
+    if image is None:
+        raise IOError(f"Could not read image {path}")
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    return image
+
+
+class PreviewCache:
+    """Thread-safe LRU of (preview, scale) keyed by (path, mtime, size, max_size)."""
+
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path, max_size=PREVIEW_SIZE):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, tuple(max_size))
+
+    def get(self, path, max_size=PREVIEW_SIZE):
+        """Cached (preview, scale) for path, or None (also when the file is missing)."""
+        try:
+            key = self.key(path, max_size)
+        except OSError:
+            return None
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            return item
+
+    def load(self, path, max_size=PREVIEW_SIZE):
+        """(preview, scale) for path, decoding and shrinking it on a miss; raises IOError if unreadable."""
+        item = self.get(path, max_size)
+        if item is not None:
+            return item
+        key = self.key(path, max_size)
+        image = FrameLib.read_image(path)
+        if image is None:
+            raise IOError(f"Could not read image {path}")
+        item = make_preview(image, max_size)
+        with self._lock:
+            self.misses += 1
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+        return item
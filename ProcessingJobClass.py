@@ -0,0 +1,129 @@
+#ProcessingJobClass.py
+import time
+import itertools
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+
+class JobSignals(QObject):
+    started = pyqtSignal(int)  # job id
+    finished = pyqtSignal(int, object)  # job id, return value
+    failed = pyqtSignal(int, str)  # job id, error message
+
+
+class ProcessingJob(QRunnable):
+    """Runs one processing function (typically IPL.MAIN) on a QThreadPool thread."""
+
+    def __init__(self, job_id, function, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)  # ProcessingQueue keeps it until the result is delivered
+        self.job_id = job_id
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self.cancelled = False
+
+    @pyqtSlot()
+    def run(self):
+        if self.cancelled:
+            # Cancelled after the pool had already dequeued it; never start the work
+            self.signals.finished.emit(self.job_id, None)
+            return
+        self.signals.started.emit(self.job_id)
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except (Exception, SystemExit) as e:  # checkFolder calls sys.exit on missing/empty folders
+            self.signals.failed.emit(self.job_id, f"{type(e).__name__}: {e}")
+        else:
+            self.signals.finished.emit(self.job_id, result)
+
+
+class ProcessingQueue(QObject):
+    """Queue of processing jobs run one at a time off the GUI thread.
+
+    Jobs run in submission order on a single pool thread, so folder renames
+    and HMI writes keep the order the parts were captured in (MAIN still
+    measures the images of a job in parallel). Callbacks are delivered on the
+    GUI thread. cancel_all() drops every queued job; the running one cannot be
+    interrupted, so its result is discarded instead. A job the pool has taken
+    but whose started signal has not arrived yet is flagged the same way; if
+    run() has not begun, it skips the work altogether.
+    """
+    changed = pyqtSignal()  # the job list or a job state changed
+
+    def __init__(self, parent=None, keep_finished=20):
+        super().__init__(parent)
+        self.keep_finished = keep_finished
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self._ids = itertools.count(1)
+        self.jobs = {}  # job id -> {"description", "state", "job", "on_done", "on_error", "on_cancel", "submitted", "seconds"}
+
+    def submit(self, description, function, *args, on_done=None, on_error=None, on_cancel=None, **kwargs):
+        """Queues function(*args, **kwargs); on_done(result), on_error(message) or on_cancel() follows on the GUI thread."""
+        job_id = next(self._ids)
+        job = ProcessingJob(job_id, function, *args, **kwargs)
+        job.signals.started.connect(self._on_started)
+        job.signals.finished.connect(self._on_finished)
+        job.signals.failed.connect(self._on_failed)
+        self.jobs[job_id] = {"description": description, "state": "queued", "job": job,
+                             "on_done": on_done, "on_error": on_error, "on_cancel": on_cancel,
+                             "submitted": time.perf_counter(), "seconds": None}
+        self.pool.start(job)
+        self.changed.emit()
+        return job_id
+
+    def active_count(self):
+        return sum(1 for entry in self.jobs.values() if entry["state"] in ("queued", "running"))
+
+    def cancel_all(self):
+        """Cancels queued jobs and marks the running one so its result is discarded. Returns the number cancelled."""
+        cancelled = 0
+        for job_id, entry in list(self.jobs.items()):
+            if entry["state"] == "queued" and self.pool.tryTake(entry["job"]):
+                self._finish(job_id, "cancelled")
+                if entry["on_cancel"] is not None:
+                    entry["on_cancel"]()
+                cancelled += 1
+            elif entry["state"] in ("queued", "running") and not entry["job"].cancelled:
+                # Running, or already dequeued by the pool with its started signal still in flight
+                entry["job"].cancelled = True
+                entry["state"] = "cancelling"
+                cancelled += 1
+        self.changed.emit()
+        return cancelled
+
+    def _finish(self, job_id, state):
+        entry = self.jobs[job_id]
+        entry["state"] = state
+        entry["seconds"] = time.perf_counter() - entry["submitted"]
+        entry["job"] = None
+
+        # Keep only the most recent finished jobs for display
+        finished = [other for other, e in self.jobs.items() if e["job"] is None and other != job_id]
+        for other in finished[:max(0, len(finished) + 1 - self.keep_finished)]:
+            del self.jobs[other]
+
+    def _on_started(self, job_id):
+        entry = self.jobs[job_id]
+        if entry["state"] == "queued":  # a job cancelled meanwhile stays "cancelling"
+            entry["state"] = "running"
+        self.changed.emit()
+
+    def _on_finished(self, job_id, result):
+        entry = self.jobs[job_id]
+        cancelled = entry["job"].cancelled
+        self._finish(job_id, "cancelled" if cancelled else "done")
+        if cancelled:
+            if entry["on_cancel"] is not None:
+                entry["on_cancel"]()
+        elif entry["on_done"] is not None:
+            entry["on_done"](result)
+        self.changed.emit()
+
+    def _on_failed(self, job_id, message):
+        entry = self.jobs[job_id]
+        self._finish(job_id, "failed")
+        if entry["on_error"] is not None:
+            entry["on_error"](message)
+        self.changed.emit()
@@ -0,0 +1,180 @@
+"""Append-only store for the averaged diameters of every MAIN run.
+
+MAIN used to add each run as a new column of all_raw_results.csv by reading,
+padding and rewriting the whole file. Runs are now single SQLite rows keyed
+by folder, timestamp and type, so a run costs one insert and a crash cannot
+leave a half-written file. export_wide_csv regenerates the legacy wide CSV
+(one column per run) on demand.
+
+Usage: python ResultsStoreLib.py export [all_raw_results.csv]
+       python ResultsStoreLib.py import <legacy wide csv>
+"""
+import os
+import re
+import sys
+import csv
+import json
+import sqlite3
+from datetime import datetime
+
+MAIN_FOLDER = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_PATH = os.path.join(MAIN_FOLDER, "all_raw_results.sqlite")
+LEGACY_CSV_PATH = os.path.join(MAIN_FOLDER, "all_raw_results.csv")
+FOLDER_RE = re.compile(r"^(?P<timestamp>\d{8}_\d{6})(?:_(?P<type>[A-Za-z0-9]+))?$")
+
+
+def parse_folder_name(folder_name):
+    # "20250101_120000_F1" -> ("20250101_120000", "F1"); unknown layouts keep the whole name as timestamp
+    m = FOLDER_RE.match(folder_name)
+    if not m:
+        return folder_name, ""
+    return m.group("timestamp"), (m.group("type") or "").upper()
+
+
+class ResultsStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")  # readers never block the line writing a run
+        with self.connection:
+            is_new = self.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'runs'").fetchone() is None
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " folder TEXT NOT NULL,"
+                " timestamp TEXT NOT NULL,"
+                " type TEXT NOT NULL,"
+                " recorded_at TEXT NOT NULL,"
+                " diameters TEXT NOT NULL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS runs_key ON runs (folder, timestamp, type)")
+            if is_new:
+                # Only a store created here still owes the legacy CSV import (see open_default_store)
+                self.connection.execute("INSERT INTO meta (key, value) VALUES ('legacy_csv', 'pending')")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get_meta(self, key, default=None):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        with self.connection:
+            self._set_meta(key, value)
+
+    def _set_meta(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _row(self, folder, diameters, file_type=None, timestamp=None):
+        folder_timestamp, folder_type = parse_folder_name(folder)
+        return (folder,
+                timestamp or folder_timestamp,
+                (file_type or folder_type or "").upper(),
+                datetime.now().isoformat(timespec="seconds"),
+                json.dumps([float(v) for v in diameters]))
+
+    def append(self, folder, diameters, file_type=None, timestamp=None):
+        """Adds one run and returns its id. file_type/timestamp default to what the folder name encodes."""
+        row = self._row(folder, diameters, file_type, timestamp)
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (folder, timestamp, type, recorded_at, diameters) VALUES (?, ?, ?, ?, ?)", row)
+        return cursor.lastrowid
+
+    def runs(self, folder=None, file_type=None):
+        """Runs in insertion order as dicts, optionally filtered by folder and/or type."""
+        query = "SELECT id, folder, timestamp, type, recorded_at, diameters FROM runs"
+        clauses, params = [], []
+        if folder is not None:
+            clauses.append("folder = ?")
+            params.append(folder)
+        if file_type is not None:
+            clauses.append("type = ?")
+            params.append(file_type.upper())
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY id"
+        return [{"id": r[0], "folder": r[1], "timestamp": r[2], "type": r[3], "recorded_at": r[4], "diameters": json.loads(r[5])}
+                for r in self.connection.execute(query, params)]
+
+    def export_wide_csv(self, csv_path=LEGACY_CSV_PATH):
+        """Writes the legacy layout: one column per run, folder name on top, values with 3 decimals."""
+        columns = [[run["folder"]] + [f"{v:.3f}" for v in run["diameters"]] for run in self.runs()]
+        n_rows = max([len(c) for c in columns] or [0])
+        tmp_path = csv_path + ".tmp"
+        with open(tmp_path, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            for i in range(n_rows):
+                writer.writerow([c[i] if i < len(c) else "" for c in columns])
+        os.replace(tmp_path, csv_path)
+        return csv_path
+
+    def import_wide_csv(self, csv_path=LEGACY_CSV_PATH, done_key=None):
+        """Appends every column of a legacy wide CSV as a run. Returns the number of runs imported.
+
+        All runs go in one transaction, so a file that fails to parse or
+        insert leaves the store as it was. done_key, when given, is set to
+        "imported" in the meta table within that same transaction.
+        """
+        with open(csv_path, "r", newline="") as csvfile:
+            rows = list(csv.reader(csvfile))
+        runs = []
+        for col in range(max([len(r) for r in rows] or [0])):
+            cells = [r[col] if col < len(r) else "" for r in rows]
+            folder = cells[0].strip()
+            values = [float(c) for c in cells[1:] if c.strip()]
+            if folder:
+                runs.append(self._row(folder, values))
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO runs (folder, timestamp, type, recorded_at, diameters) VALUES (?, ?, ?, ?, ?)", runs)
+            if done_key is not None:
+                self._set_meta(done_key, "imported")
+        return len(runs)
+
+
+def open_default_store():
+    """Opens the store next to the library, importing the legacy CSV into a store created for it.
+
+    Whether that import is still owed is kept in the meta table ("pending"
+    until it commits), so an import that failed is retried on the next open
+    instead of leaving a partial store. A failure is reported and the store
+    is returned anyway, so MAIN can still record its run.
+    """
+    store = ResultsStore(DEFAULT_STORE_PATH)
+    if store.get_meta("legacy_csv") == "pending":
+        if not os.path.exists(LEGACY_CSV_PATH):
+            # Nothing to migrate; a CSV exported later must not be imported back
+            store.set_meta("legacy_csv", "none")
+            return store
+        try:
+            count = store.import_wide_csv(LEGACY_CSV_PATH, done_key="legacy_csv")
+        except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+            print(f"Could not import {LEGACY_CSV_PATH}, will retry next time: {e}")
+        else:
+            print(f"Imported {count} runs from {LEGACY_CSV_PATH}")
+    return store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("export", "import"):
+        print(__doc__)
+        sys.exit(1)
+    with open_default_store() as store:
+        if sys.argv[1] == "export":
+            path = store.export_wide_csv(sys.argv[2] if len(sys.argv) > 2 else LEGACY_CSV_PATH)
+            print(f"Wrote {path}")
+        else:
+            if len(sys.argv) < 3:
+                print(__doc__)
+                sys.exit(1)
+            print(f"Imported {store.import_wide_csv(sys.argv[2])} runs from {sys.argv[2]}")
@@ -1,5 +1,7 @@
 import numpy as np
 import os
+import threading
+from dataclasses import dataclass
 
 
 def read_info(folder_name, base_dir="StandardDimentions"):
@@ -67,4 +69,169 @@ def read_ESLH_values(folder_name, base_dir="StandardDimentions"):
                 print(f"Error reading file {file_name}: {e}")
     
     # Return a tuple of numpy arrays
-    return tuple(arrays)
\ No newline at end of file
+    return tuple(arrays)
+
+
+@dataclass(frozen=True)
+class StandardType:
+    """One parsed StandardDimentions/<name> folder."""
+    name: str
+    variables: dict
+    arrays: dict          # read_info arrays, e.g. "Diameters" and "Pitchs"
+    distances: np.ndarray # Diameters[:, 0]
+    diameters: np.ndarray # Diameters[:, 1]
+    eslh: tuple           # read_ESLH_values arrays
+
+
+class StandardsRegistry:
+    """All standard types parsed once, reloaded only when a file under base_dir changes.
+
+    Every access stats the type folders and their .txt files; if any mtime,
+    size, or the set of files differs from the last load, everything is
+    re-parsed. Diameters of all types are also kept stacked in one
+    (types x points) matrix, NaN-padded, so the closest-type match is a single
+    array operation. Returned arrays are read-only because they are shared.
+    """
+
+    def __init__(self, base_dir="StandardDimentions"):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._signature = None
+        self._types = {}
+        self._names = ()
+        self._diameter_matrix = np.empty((0, 0))
+        self._distance_matrix = np.empty((0, 0))
+        self.loads = 0
+
+    def _current_signature(self):
+        entries = []
+        for folder in sorted(os.scandir(self.base_dir), key=lambda e: e.name):
+            if not folder.is_dir():
+                continue
+            for f in sorted(os.scandir(folder.path), key=lambda e: e.name):
+                if f.name.endswith(".txt"):
+                    st = f.stat()
+                    entries.append((folder.name, f.name, st.st_mtime_ns, st.st_size))
+        return tuple(entries)
+
+    def _load(self):
+        types = {}
+        for name in sorted(os.listdir(self.base_dir)):
+            if not os.path.isdir(os.path.join(self.base_dir, name)):
+                continue
+            try:
+                info = read_info(name, self.base_dir)
+            except FileNotFoundError as e:
+                print(f"Error reading folder '{name}': {e}")
+                continue
+            eslh = read_ESLH_values(name, self.base_dir)
+            for array in list(info["arrays"].values()) + list(eslh):
+                array.setflags(write=False)
+            table = info["arrays"]["Diameters"]
+            types[name] = StandardType(name, info["variables"], info["arrays"], table[:, 0], table[:, 1], eslh)
+
+        n_points = max([len(t.diameters) for t in types.values()] or [0])
+        diameter_matrix = np.full((len(types), n_points), np.nan)
+        distance_matrix = np.full((len(types), n_points), np.nan)
+        for row, t in enumerate(types.values()):
+            diameter_matrix[row, :len(t.diameters)] = t.diameters
+            distance_matrix[row, :len(t.distances)] = t.distances
+        diameter_matrix.setflags(write=False)
+        distance_matrix.setflags(write=False)
+
+        self._types = types
+        self._names = tuple(types)
+        self._diameter_matrix = diameter_matrix
+        self._distance_matrix = distance_matrix
+        self.loads += 1
+
+    def refresh(self):
+        """Reloads if anything under base_dir changed since the last load."""
+        with self._lock:
+            signature = self._current_signature()
+            if signature != self._signature:
+                self._load()
+                self._signature = signature
+        return self
+
+    @property
+    def names(self):
+        # Type names in load order; loads on first access like every other accessor
+        self.refresh()
+        return self._names
+
+    @property
+    def diameter_matrix(self):
+        self.refresh()
+        return self._diameter_matrix
+
+    @property
+    def distance_matrix(self):
+        self.refresh()
+        return self._distance_matrix
+
+    def get(self, name):
+        self.refresh()
+        if name not in self._types:
+            raise FileNotFoundError(f"No standard dimensions for type '{name}' in {self.base_dir}.")
+        return self._types[name]
+
+    def types(self):
+        self.refresh()
+        return dict(self._types)
+
+    def info(self, name):
+        # Same shape as read_info
+        t = self.get(name)
+        return {"variables": t.variables, "arrays": t.arrays}
+
+    def eslh(self, name):
+        # Same as read_ESLH_values
+        return self.get(name).eslh
+
+    def data(self):
+        # {name: read_info(name)} for every type, the layout MAIN plots from
+        return {name: {"variables": t.variables, "arrays": t.arrays} for name, t in self.types().items()}
+
+    def compare(self, average_diameters, compare_indices=(0, 1, 2, 3, 4)):
+        """Closest type by summed |difference| at compare_indices, plus per-type differences.
+
+        Indices missing from a type or from the measurement are left out, and
+        ties go to the first type.
+        """
+        self.refresh()
+        average_diameters = np.asarray(average_diameters, dtype=float)
+        n = min(self._diameter_matrix.shape[1], len(average_diameters))
+        indices = [i for i in compare_indices if i < n]
+
+        standard = self._diameter_matrix[:, indices]
+        differences = np.where(np.isnan(standard), 0.0, np.abs(average_diameters[indices] - standard))
+        totals = differences.sum(axis=1)
+
+        closest = None
+        if len(totals) and not np.all(np.isnan(totals)):
+            closest = self._names[int(np.argmin(np.where(np.isnan(totals), np.inf, totals)))]
+
+        comparison_results = {}
+        for row, name in enumerate(self._names):
+            t = self._types[name]
+            m = min(len(t.diameters), len(average_diameters))
+            comparison_results[name] = {
+                "distances": t.distances[:m],
+                "diameter_differences": average_diameters[:m] - t.diameters[:m],
+                "total_difference": totals[row],
+            }
+        return closest, comparison_results
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(base_dir="StandardDimentions"):
+    """Process-wide registry for base_dir (resolved against the current directory)."""
+    key = os.path.abspath(base_dir)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = StandardsRegistry(key)
+        return _registries[key]
@@ -0,0 +1,242 @@
+"""Synthetic jig images with known geometry, for benchmarks and accuracy checks.
+
+render_scene draws what the camera sees on the jig: a 6016x4016 backlit frame
+with the three gauges ProcessImage calibrates against and a file with helical
+flutes. The file is built from a StandardDimentions type: the diameter
+envelope comes from its Diameters table, the flute pitch from Pitchs, and the
+shank from DW. Edges are anti-aliased at sub-pixel precision, then blurred and
+given sensor noise. Every image comes with its ground truth (pixel size, tip,
+axis angle, nominal diameters), so timing runs and accuracy regressions of
+ImageProcessLib have a repeatable input without recorded frames.
+
+The layout follows what FindContoursIndex expects: dark objects on a bright
+background, the vertical gauge right of everything else, then the top gauge,
+the file and the bottom gauge from top to bottom. All of them stay inside the
+borders that masked_gray paints white.
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import cv2
+
+import FrameLib
+import StandardDimentions as Stnds
+
+SENSOR_SIZE = (6016, 4016)  # width, height
+GAUGE_SIZES = {"top": 19.674, "bottom": 10.381, "right": 7.608}  # mm, as in ProcessImage
+GAUGE_THICKNESS = 1.0  # mm
+DEFAULT_PIXEL_SIZE = 5.0  # microns
+
+# Layout in sensor pixels. x/y are the gauge left edges or centres and the file tip.
+TOP_GAUGE_LEFT, TOP_GAUGE_Y = 450, 800
+BOTTOM_GAUGE_LEFT, BOTTOM_GAUGE_Y = 450, 3250
+RIGHT_GAUGE_X = 5650
+FILE_TIP = (5000, 2008)
+
+# Widest of the borders CalibrateImageContext and FindContourContext paint white (left, right, top, bottom)
+_MASK = (300, 200, 400, 400)
+
+
+def _to_fixed(points, shift=4):
+    # fillPoly takes integer points; shift keeps 1/16 px of precision
+    return np.round(np.asarray(points) * (1 << shift)).astype(np.int32)
+
+
+def _fill(image, points, level):
+    cv2.fillPoly(image, [_to_fixed(points)], int(level), lineType=cv2.LINE_AA, shift=4)
+
+
+def _rectangle(x0, y0, x1, y1):
+    return [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+
+
+def file_radii(standard, s, flute_depth=0.15, tip_angle=60.0, phase=0.0):
+    """Upper and lower edge radius (mm) of the file at distances s (mm) back from the tip.
+
+    The envelope is Diameters/2, running linearly from the last table point
+    to DW at LW and staying at DW along the shank. The tip is a cone of
+    tip_angle degrees. Over FluteLength each edge dips by up to flute_depth
+    of the envelope for half of every Pitchs(s) mm and runs along the
+    envelope (the cutting edge) for the other half. The lower edge dips
+    while the upper one is on the envelope and vice versa, so the silhouette
+    keeps the nominal diameter between cutting edges on either side. phase
+    (in pitches) turns the file about its axis.
+    """
+    variables = standard.variables
+    distances = list(standard.distances)
+    diameters = list(standard.diameters)
+    wire = variables.get("DW", 1.2)
+    wire_distance = variables.get("LW", 17.0)
+    if wire_distance > distances[-1]:
+        distances.append(wire_distance)
+        diameters.append(wire)
+    envelope = np.interp(s, distances, diameters, right=wire) / 2
+
+    envelope = np.minimum(envelope, s * np.tan(np.radians(tip_angle / 2)))
+
+    pitch_table = standard.arrays.get("Pitchs")
+    if pitch_table is None or len(pitch_table) == 0:
+        pitch = np.full_like(s, 1.0)
+    else:
+        pitch = np.interp(s, pitch_table[:, 0], pitch_table[:, 1])
+    turns = np.concatenate(([0.0], np.cumsum(np.diff(s) / pitch[1:]))) + phase
+
+    fluted = s <= variables.get("FluteLength", distances[-1])
+    # Positive half-wave on one side, negative on the other: never both dipped at once
+    wave = np.sin(2 * np.pi * turns)
+    upper = envelope * (1 - flute_depth * fluted * np.maximum(wave, 0))
+    lower = envelope * (1 - flute_depth * fluted * np.maximum(-wave, 0))
+    return upper, lower
+
+
+def file_outline(standard, pixel_size, tip=FILE_TIP, angle=0.3, **profile):
+    """Closed outline (N x 2, pixels) of the file, tip towards +x, running off the left of the frame."""
+    mm = 1000.0 / pixel_size  # pixels per mm
+    direction = np.array([np.cos(np.radians(angle)), np.sin(np.radians(angle))])
+    normal = np.array([-direction[1], direction[0]])
+
+    length = (tip[0] + 50) / mm / direction[0]
+    s = np.arange(0, length, 0.5 / mm)  # two samples per pixel along the axis
+    upper, lower = file_radii(standard, s, **profile)
+
+    axis = np.asarray(tip, dtype=float) - np.outer(s * mm, direction)
+    top = axis - np.outer(upper * mm, normal)  # image y grows downwards
+    bottom = axis + np.outer(lower * mm, normal)
+    return np.vstack((top, bottom[::-1]))
+
+
+def check_layout(pixel_size, tip=FILE_TIP, standard=None):
+    # The gauges have to stay inside the masks and clear of each other at this scale
+    mm = 1000.0 / pixel_size
+    width, height = SENSOR_SIZE
+    left, right, top, bottom = _MASK
+    half = GAUGE_THICKNESS * mm / 2
+    wire_distance = standard.variables.get("LW", 17.0) if standard is not None else 17.0
+    right_half = GAUGE_SIZES["right"] * mm / 2
+    checks = [
+        (TOP_GAUGE_LEFT + GAUGE_SIZES["top"] * mm < RIGHT_GAUGE_X - half, "top gauge reaches the right gauge"),
+        (RIGHT_GAUGE_X + half < width - right, "right gauge is under the right mask"),
+        (TOP_GAUGE_Y - half > top, "top gauge is under the top mask"),
+        (BOTTOM_GAUGE_Y + half < height - bottom, "bottom gauge is under the bottom mask"),
+        (FILE_TIP[1] - right_half > TOP_GAUGE_Y + half and FILE_TIP[1] + right_half < BOTTOM_GAUGE_Y - half,
+         "right gauge overlaps the top or bottom gauge"),
+        (tip[0] < RIGHT_GAUGE_X - half, "file tip reaches the right gauge"),
+        (tip[0] - (wire_distance + 1) * mm > left, "wire section is under the left mask"),
+    ]
+    for ok, message in checks:
+        if not ok:
+            raise ValueError(f"Pixel size {pixel_size} um does not fit the jig layout: {message}")
+
+
+def render_scene(file_type, pixel_size=DEFAULT_PIXEL_SIZE, angle=0.3, tip=FILE_TIP, phase=0.0,
+                 flute_depth=0.15, background=215, foreground=25, blur=1.2, noise=3.0, seed=None,
+                 base_dir="StandardDimentions"):
+    """Renders one jig frame. Returns (grayscale uint8 image, ground truth dict).
+
+    pixel_size is in microns; angle tilts the file axis (degrees, 0 makes the
+    normal at the wire section vertical, which CalibrateImage does not
+    handle). blur is the Gaussian sigma in pixels, noise the sensor noise
+    sigma in grey levels; seed makes the noise repeatable.
+    """
+    standard = Stnds.get_registry(base_dir).get(file_type)
+    check_layout(pixel_size, tip, standard)
+    mm = 1000.0 / pixel_size
+    width, height = SENSOR_SIZE
+
+    image = np.full((height, width), background, dtype=np.uint8)
+    half = GAUGE_THICKNESS * mm / 2
+    top_length = GAUGE_SIZES["top"] * mm
+    bottom_length = GAUGE_SIZES["bottom"] * mm
+    right_length = GAUGE_SIZES["right"] * mm
+    _fill(image, _rectangle(TOP_GAUGE_LEFT, TOP_GAUGE_Y - half, TOP_GAUGE_LEFT + top_length, TOP_GAUGE_Y + half), foreground)
+    _fill(image, _rectangle(BOTTOM_GAUGE_LEFT, BOTTOM_GAUGE_Y - half, BOTTOM_GAUGE_LEFT + bottom_length, BOTTOM_GAUGE_Y + half), foreground)
+    _fill(image, _rectangle(RIGHT_GAUGE_X - half, FILE_TIP[1] - right_length / 2, RIGHT_GAUGE_X + half, FILE_TIP[1] + right_length / 2), foreground)
+    _fill(image, file_outline(standard, pixel_size, tip, angle, flute_depth=flute_depth, phase=phase), foreground)
+
+    if blur:
+        cv2.GaussianBlur(image, (0, 0), blur, dst=image)
+    if noise:
+        rng = np.random.default_rng(seed)
+        noisy = image.astype(np.float32)
+        noisy += rng.standard_normal(noisy.shape, dtype=np.float32) * noise
+        image = np.clip(noisy, 0, 255, out=noisy).astype(np.uint8)
+
+    truth = {
+        "type": file_type,
+        "pixel_size": pixel_size,
+        "gauges": dict(GAUGE_SIZES),
+        "tip": [float(tip[0]), float(tip[1])],
+        "angle": angle,
+        "phase": phase,
+        "flute_depth": flute_depth,
+        "blur": blur,
+        "noise": noise,
+        "seed": seed,
+        "distances": standard.distances.tolist(),
+        "diameters": standard.diameters.tolist(),
+        "wire_diameter": standard.variables.get("DW"),
+        "wire_distance": standard.variables.get("LW"),
+    }
+    return image, truth
+
+
+def truth_path(image_path):
+    return os.path.splitext(image_path)[0] + ".json"
+
+
+def load_truth(image_path):
+    """Ground truth written next to a generated image, or None for a recorded frame."""
+    path = truth_path(image_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def generate(out_dir, file_types, count=3, format="bmp", level=None, seed=0, log=print, **scene):
+    """Writes count frames per type to out_dir/<type>/, each with its .json ground truth.
+
+    Frame k of a type turns the file by k/count of a pitch and shifts the tip
+    by a few pixels, like successive shots of one part. Returns the image paths.
+    """
+    rng = np.random.default_rng(seed)
+    paths = []
+    for file_type in file_types:
+        folder = os.path.join(out_dir, file_type)
+        os.makedirs(folder, exist_ok=True)
+        for k in range(count):
+            tip = (FILE_TIP[0] + rng.uniform(-20, 20), FILE_TIP[1] + rng.uniform(-20, 20))
+            image, truth = render_scene(file_type, tip=tip, phase=k / count, seed=int(rng.integers(2**31)), **scene)
+            path = os.path.join(folder, f"synthetic_{file_type}_{k}{FrameLib.ARCHIVE_FORMATS[format]}")
+            FrameLib.write_image(image, path, format, level)
+            with open(truth_path(path), "w") as f:
+                json.dump(truth, f, indent=2)
+            paths.append(path)
+        log(f"{file_type}: {count} frame(s) in {folder}")
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render synthetic jig frames with ground truth")
+    parser.add_argument("out_dir")
+    parser.add_argument("--types", nargs="+", default=None, help="StandardDimentions types (default: all)")
+    parser.add_argument("--count", type=int, default=3, help="frames per type")
+    parser.add_argument("--format", choices=list(FrameLib.ARCHIVE_FORMATS), default="bmp")
+    parser.add_argument("--pixel-size", type=float, default=DEFAULT_PIXEL_SIZE, help="microns per pixel")
+    parser.add_argument("--angle", type=float, default=0.3, help="file axis tilt in degrees")
+    parser.add_argument("--blur", type=float, default=1.2, help="Gaussian blur sigma in pixels")
+    parser.add_argument("--noise", type=float, default=3.0, help="noise sigma in grey levels")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    file_types = args.types or list(Stnds.get_registry().names)
+    paths = generate(args.out_dir, file_types, args.count, args.format, seed=args.seed,
+                     pixel_size=args.pixel_size, angle=args.angle, blur=args.blur, noise=args.noise)
+    print(f"{len(paths)} frame(s) written to {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Measure per-batch wall clock of the calibrate-and-measure pipeline with and without the shared ImageContext.
+
+The legacy path calls the path-based CalibrateImage/FindContour/plot_image_with_data,
+so every stage decodes the BMP again. The context path is what CalculateAllImages does now.
+
+Usage: python bench_image_context.py <folder with BMPs> [repeats]
+"""
+import os
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import ImageProcessLib as IPL
+
+TOP, BOTTOM, RIGHT = 19.674, 10.381, 7.608
+
+
+def run_legacy(bmp_files):
+    for ImagePath in bmp_files:
+        PixelSize, VerticalScale, Threshold, _ = IPL.CalibrateImage(ImagePath, TOP, BOTTOM, RIGHT)
+        file_x, file_y, _ = IPL.FindContour(ImagePath, Threshold)
+        MeasuredDs = IPL.CalDias(np.arange(0, 17, 1), file_x, file_y, PixelSize, VerticalScale)
+        IPL.plot_image_with_data(ImagePath, file_x, file_y, MeasuredDs)
+
+
+def run_context(bmp_files):
+    for ImagePath in bmp_files:
+        Context = IPL.ImageContext(ImagePath)
+        PixelSize, VerticalScale, Threshold, _ = IPL.CalibrateImageContext(Context, TOP, BOTTOM, RIGHT)
+        file_x, file_y, _ = IPL.FindContourContext(Context, Threshold)
+        MeasuredDs = IPL.CalDias(np.arange(0, 17, 1), file_x, file_y, PixelSize, VerticalScale)
+        IPL.plot_image_context_with_data(Context, file_x, file_y, MeasuredDs)
+
+
+def best_of(func, bmp_files, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(bmp_files)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    folder = sys.argv[1]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    bmp_files = IPL.checkFolder(folder)
+    legacy = best_of(run_legacy, bmp_files, repeats)
+    context = best_of(run_context, bmp_files, repeats)
+
+    print(f"Images per batch : {len(bmp_files)}")
+    print(f"Legacy (per-stage decode) : {legacy:.3f} s")
+    print(f"ImageContext (one decode) : {context:.3f} s")
+    print(f"Reduction                 : {legacy - context:.3f} s ({(1 - context / legacy) * 100:.1f} %)")
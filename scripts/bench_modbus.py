@@ -0,0 +1,99 @@
+"""Part-cycle throughput of the HMI integration against the local Modbus simulator.
+
+legacy:    what CameraApp did before: per part, a fresh client reads D1, then a fresh client writes S0
+session:   shared ModbusSession, ResultPublisher write + PLC snapshot (M501-M506, D0/D1) per part
+
+For each mode it reports how long the part cycle is blocked (the time the capture/measurement
+thread spends in the HMI code) and the end-to-end delivery time until the result is on the PLC.
+
+Usage: python bench_modbus.py [--parts 100] [--baudrate 9600] [--latency 0.005] [--error-rate 0.02] [--drop-rate 0.0]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import ModbusLib
+import ModbusSimLib
+from FrameLib import LatencyStats
+
+
+def run_legacy(factory, parts):
+    blocked = LatencyStats(parts)
+    failures = 0
+    start = time.perf_counter()
+    for part in range(parts):
+        t0 = time.perf_counter()
+        for step in ("read", "write"):
+            session = ModbusLib.ModbusSession(client_factory=factory, backoff_start=0.0)
+            try:
+                if step == "read":
+                    session.read_holding_registers(1, 1)
+                else:
+                    session.write_register(ModbusLib.S0_ADDRESS, 6 + part % 6)
+            except (ConnectionError, IOError):
+                failures += 1
+            finally:
+                session.close()
+        blocked.record((time.perf_counter() - t0) * 1000)
+    return {"parts_per_s": parts / (time.perf_counter() - start), "blocked": blocked.summary(),
+            "delivery": blocked.summary(), "failures": failures}
+
+
+def run_session(factory, parts):
+    session = ModbusLib.ModbusSession(client_factory=factory, backoff_start=0.05)
+    reader = ModbusLib.PLCReader(session)
+    delivered = threading.Semaphore(0)
+    errors = []
+    publisher = ModbusLib.ResultPublisher(session, reader, on_delivered=lambda *args: delivered.release(), on_error=errors.append)
+    blocked = LatencyStats(parts)
+
+    start = time.perf_counter()
+    for part in range(parts):
+        t0 = time.perf_counter()
+        publisher.publish(6 + part % 6)
+        blocked.record((time.perf_counter() - t0) * 1000)
+        delivered.acquire()  # one part per delivery, so nothing is coalesced and the rate is end to end
+    elapsed = time.perf_counter() - start
+    publisher.stop()
+    session.close()
+    return {"parts_per_s": parts / elapsed, "blocked": blocked.summary(), "delivery": publisher.latency.summary(),
+            "failures": len(errors), "session": session.stats()}
+
+
+def report(name, result):
+    print(f"{name}: {result['parts_per_s']:.1f} parts/s, {result['failures']} failure(s)")
+    for key in ("blocked", "delivery"):
+        stats = result[key]
+        if stats["count"]:
+            print(f"  {key:8s} mean {stats['mean_ms']:.1f} ms  p50 {stats['p50_ms']:.1f} ms  p95 {stats['p95_ms']:.1f} ms  max {stats['max_ms']:.1f} ms")
+    if "session" in result:
+        print(f"  session  {result['session']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parts", type=int, default=100)
+    parser.add_argument("--baudrate", type=int, default=9600, help="emulated RS485 speed (0 for none)")
+    parser.add_argument("--latency", type=float, default=0.005, help="extra device latency per request, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=0.5, help="client timeout, seconds")
+    args = parser.parse_args(argv)
+
+    with ModbusSimLib.ModbusSimulator(baudrate=args.baudrate or None, latency=args.latency,
+                                      error_rate=args.error_rate, drop_rate=args.drop_rate, seed=0) as simulator:
+        factory = ModbusLib.tcp_client_factory(simulator.host, simulator.port, args.timeout)
+        report("legacy", run_legacy(factory, args.parts))
+        report("session", run_session(factory, args.parts))
+        print(f"simulator {simulator.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""Per-stage timings of the measurement pipeline on fixed frames, checked against a stored baseline.
+
+Stages, each timed on its own per image:
+  decode       ImageContext (reading the file)
+  calibrate    CalibrateImageContext, threshold sweep (or search) plus the wire section
+  contour      FindContourContext at the calibrated threshold, on a fresh context
+  caldias      CalDias on a fresh ContourGeometry (smoothing, centre line, extrema)
+  tipdia       CalTipDiaFromMinMaxPoints on a fresh ContourGeometry
+  plot         plot_image_context_with_data
+  main         MAIN over the whole folder (one run per repeat)
+
+Frames are the images of --images, or synthetic jig frames (SyntheticJigLib) rendered
+once into a temporary folder. All outputs (plots, raw.txt, the results store) go to
+that temporary folder, so recorded data is never written to. With synthetic frames the
+diameter error against the ground truth is reported as well.
+
+Results (median/p95 per stage, peak RSS, accuracy) can be written with --out. With
+--baseline they are compared to an earlier result: a median or the peak RSS more than
+--tolerance above the baseline, or a larger diameter error, is a regression and the
+exit status is 1. --save-baseline stores this run as the baseline instead.
+
+Usage: python bench_pipeline.py [--images DIR | --types F1 S1] [--count 3] [--repeats 5]
+                                [--mode sweep] [--workers 1] [--out result.json]
+                                [--baseline baseline.json] [--save-baseline] [--tolerance 0.2]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import cv2
+import matplotlib.pyplot as plt
+import ImageProcessLib as IPL
+import ResultsStoreLib as RSL
+import SyntheticJigLib
+from FrameLib import LatencyStats
+
+TOP, BOTTOM, RIGHT = 19.674, 10.381, 7.608
+STAGES = ("decode", "calibrate", "contour", "caldias", "tipdia", "plot", "main")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_pipeline_baseline.json")
+
+
+def peak_rss_mb():
+    # Peak resident set of this process; None where neither resource nor psutil is available
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2**20  # peak_wset is the Windows peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+class StageTimer:
+    def __init__(self):
+        self.stats = {stage: LatencyStats(100000) for stage in STAGES}
+
+    def __call__(self, stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.stats[stage].record((time.perf_counter() - start) * 1000)
+        return result
+
+    def summary(self):
+        return {stage: stats.summary() for stage, stats in self.stats.items() if stats.count}
+
+
+def measure_image(ImagePath, work_dir, mode, layout, timer):
+    # One pass of every per-image stage; returns the measured diameters
+    Context = timer("decode", IPL.ImageContext, ImagePath)
+    Context.path = os.path.join(work_dir, os.path.basename(ImagePath)) # plots go to work_dir
+
+    PixelSize, VerticalScale, Threshold, _ = timer("calibrate", IPL.CalibrateImageContext, Context, TOP, BOTTOM, RIGHT, mode, layout)
+
+    # Calibration caches the contour and geometry in Context; time them again from scratch
+    Fresh = IPL.ImageContext(Context.path, Context.gray)
+    file_x, file_y, _ = timer("contour", IPL.FindContourContext, Fresh, Threshold, layout)
+
+    Geometry = IPL.ContourGeometry(file_x, file_y, PixelSize)
+    MeasuredDs = timer("caldias", IPL.CalDias, np.arange(0, 17, 1), file_x, file_y, PixelSize, VerticalScale, Geometry)
+
+    Geometry = IPL.ContourGeometry(file_x, file_y, PixelSize)
+    timer("tipdia", IPL.CalTipDiaFromMinMaxPoints, file_x, file_y, PixelSize, VerticalScale, Geometry)
+
+    timer("plot", IPL.plot_image_context_with_data, Context, file_x, file_y, MeasuredDs)
+    return np.asarray(MeasuredDs[1], dtype=float)
+
+
+def diameter_errors(measured, truth):
+    # |measured - nominal| (mm) at the distances both cover
+    nominal = np.asarray(truth["diameters"], dtype=float)
+    n = min(len(measured), len(nominal))
+    return np.abs(measured[:n] - nominal[:n])
+
+
+def run(image_paths, work_dir, repeats, warmup, mode, workers):
+    layout = IPL.SharedROILayout() if mode == "search" else None
+    timer = StageTimer()
+    errors = []
+    for k in range(warmup + repeats):
+        if k == warmup:
+            timer = StageTimer() # drop the warm-up passes (ROI layout learning, pool start-up)
+        for ImagePath in image_paths:
+            measured = measure_image(ImagePath, work_dir, mode, layout, timer)
+            truth = SyntheticJigLib.load_truth(ImagePath)
+            if truth is not None and k == warmup:
+                errors.append(diameter_errors(measured, truth))
+
+        # MAIN writes its plots into the folder it reads, so every run gets a fresh copy of the frames
+        main_dir = os.path.join(work_dir, f"main_{k}")
+        os.makedirs(main_dir)
+        for ImagePath in image_paths:
+            shutil.copy(ImagePath, main_dir)
+        timer("main", IPL.MAIN, main_dir, workers)
+        shutil.rmtree(main_dir)
+
+    result = {"stages": timer.summary(), "peak_rss_mb": peak_rss_mb()}
+    if errors:
+        errors = np.concatenate(errors)
+        result["accuracy"] = {"max_error_mm": float(np.nanmax(errors)), "mean_error_mm": float(np.nanmean(errors)),
+                              "missing": int(np.isnan(errors).sum())}
+    return result
+
+
+def compare(result, baseline, tolerance, accuracy_tolerance):
+    """Lines describing each regression against baseline; empty when there is none."""
+    regressions = []
+    for stage, stats in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        if stats["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{stage}: median {stats['p50_ms']:.1f} ms vs baseline {base['p50_ms']:.1f} ms")
+    if result.get("peak_rss_mb") and baseline.get("peak_rss_mb"):
+        if result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"peak RSS {result['peak_rss_mb']:.0f} MB vs baseline {baseline['peak_rss_mb']:.0f} MB")
+    if "accuracy" in result and "accuracy" in baseline:
+        now, base = result["accuracy"]["max_error_mm"], baseline["accuracy"]["max_error_mm"]
+        if now > base + accuracy_tolerance:
+            regressions.append(f"max diameter error {now:.4f} mm vs baseline {base:.4f} mm")
+    return regressions
+
+
+def print_report(result, baseline=None):
+    print(f"{'stage':<10} {'runs':>5} {'median ms':>10} {'p95 ms':>10} {'max ms':>10} {'baseline':>10}")
+    for stage, stats in result["stages"].items():
+        base = (baseline or {}).get("stages", {}).get(stage)
+        change = f"{(stats['p50_ms'] / base['p50_ms'] - 1) * 100:+.1f} %" if base else ""
+        print(f"{stage:<10} {stats['count']:>5} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} {stats['max_ms']:>10.1f} {change:>10}")
+    if result["peak_rss_mb"] is not None:
+        print(f"Peak RSS: {result['peak_rss_mb']:.0f} MB")
+    if "accuracy" in result:
+        accuracy = result["accuracy"]
+        print(f"Diameter error: max {accuracy['max_error_mm']:.4f} mm, mean {accuracy['mean_error_mm']:.4f} mm, "
+              f"{accuracy['missing']} point(s) not measured")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the measurement pipeline")
+    parser.add_argument("--images", help="folder of recorded frames (default: synthetic frames)")
+    parser.add_argument("--types", nargs="+", default=["F1"], help="synthetic file types")
+    parser.add_argument("--count", type=int, default=3, help="synthetic frames per type")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--mode", choices=("sweep", "search"), default="sweep", help="calibration mode")
+    parser.add_argument("--workers", type=int, default=1, help="MAIN worker processes")
+    parser.add_argument("--out", help="write the result JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slow-down / RSS growth")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.005, help="allowed growth of the max diameter error (mm)")
+    args = parser.parse_args(argv)
+
+    images = os.path.abspath(args.images) if args.images else None
+    os.chdir(project_root) # MAIN reads StandardDimentions relative to the working directory
+    plt.switch_backend("Agg")
+
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as work_dir:
+        # MAIN appends every run to the results store; keep benchmark runs out of the real one
+        RSL.DEFAULT_STORE_PATH = os.path.join(work_dir, "all_raw_results.sqlite")
+        RSL.LEGACY_CSV_PATH = os.path.join(work_dir, "all_raw_results.csv")
+
+        if images:
+            image_paths = sorted(IPL.checkFolder(images))
+        else:
+            image_paths = SyntheticJigLib.generate(os.path.join(work_dir, "frames"), args.types, args.count, log=lambda message: None)
+        if not image_paths:
+            print("No images to benchmark")
+            return 1
+
+        print(f"{len(image_paths)} image(s), {args.repeats} repeat(s), calibration mode {args.mode}")
+        result = run(image_paths, work_dir, args.repeats, args.warmup, args.mode, args.workers)
+
+    result["meta"] = {
+        "images": args.images or f"synthetic {' '.join(args.types)} x{args.count}",
+        "count": len(image_paths),
+        "repeats": args.repeats,
+        "mode": args.mode,
+        "workers": args.workers,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    if baseline.get("meta", {}).get("platform") != result["meta"]["platform"]:
+        print(f"Note: baseline was taken on {baseline.get('meta', {}).get('platform')}")
+    regressions = compare(result, baseline, args.tolerance, args.accuracy_tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
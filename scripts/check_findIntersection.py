@@ -0,0 +1,100 @@
+"""Compare the vectorized findIntersection with the original double loop (findIntersection_reference).
+
+With a folder argument the normals come from real file contours (the same 17 mm
+wire normal CalibrateImage builds, at every threshold of the sweep grid);
+without one, random contours around random normals are used.
+
+Usage: python check_findIntersection.py [folder with BMPs]
+"""
+import os
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import ImageProcessLib as IPL
+
+
+def findIntersection_reference(x1,y1,x2,y2):
+    # The findIntersection loop as it was before vectorizing
+    long = len(x1)
+    short = len(x2)
+    dmin = 1000
+    for i in range(long):
+        for j in range(short):
+            d = IPL.distance(x1[i],y1[i],x2[j],y2[j])
+            if(d<dmin):
+                dmin = d
+                i_Min = i
+                j_min = j
+                
+    return [x1[i_Min],y2[j_min]]
+
+
+def normal_cases_from_contour(file_x, file_y, PixelSize=4.0):
+    y_smooth = IPL.ReduceYNoise(file_x, file_y)
+    y_CenterLine, coefficients = IPL.FitCenterLine(file_x, y_smooth)
+    slope, intercept = coefficients
+    x_tip = file_x[np.argmax(file_x)]
+    y_tip = y_CenterLine[np.argmax(file_x)]
+    cases = []
+    for LW in np.arange(1, 17, 1):
+        Distance = -LW / PixelSize * 1000
+        xCenter = x_tip + Distance / np.sqrt(1 + slope**2)
+        yCenter = y_tip - slope * (x_tip - xCenter)
+        xNormal = np.arange(xCenter-10, xCenter+10, 0.01)
+        yNormal = -1/slope*(xNormal-xCenter)+yCenter
+        mask = np.isin(file_x, xNormal.astype(int))
+        selected_x, selected_y = file_x[mask], file_y[mask]
+        top = selected_y > yCenter
+        for m in (top, np.logical_not(top)):
+            if np.any(m):
+                cases.append((xNormal, yNormal, selected_x[m], selected_y[m]))
+    return cases
+
+
+def random_cases(n, seed=0):
+    rng = np.random.default_rng(seed)
+    cases = []
+    for _ in range(n):
+        xc, yc = rng.uniform(500, 5000), rng.uniform(500, 3500)
+        slopeNormal = rng.uniform(-50, 50)
+        xNormal = np.arange(xc-10, xc+10, 0.01)
+        yNormal = slopeNormal*(xNormal-xc)+yc
+        count = rng.integers(1, 80)
+        x2 = rng.integers(int(xc)-10, int(xc)+10, count).astype(np.int32)
+        y2 = (yc + rng.integers(-150, 150, count)).astype(np.int32)
+        cases.append((xNormal, yNormal, x2, y2))
+    return cases
+
+
+if __name__ == '__main__':
+    cases = []
+    if len(sys.argv) > 1:
+        for ImagePath in IPL.checkFolder(sys.argv[1]):
+            Context = IPL.ImageContext(ImagePath)
+            for threshold in range(90, 190, 5):
+                file_x, file_y, _ = IPL.FindContourContext(Context, threshold)
+                cases.extend(normal_cases_from_contour(file_x, file_y))
+    else:
+        cases = random_cases(200)
+
+    mismatches = 0
+    old_time = new_time = 0.0
+    for x1, y1, x2, y2 in cases:
+        start = time.perf_counter()
+        expected = findIntersection_reference(x1, y1, x2, y2)
+        old_time += time.perf_counter() - start
+        start = time.perf_counter()
+        got = IPL.findIntersection(x1, y1, x2, y2)
+        new_time += time.perf_counter() - start
+        if expected[0] != got[0] or expected[1] != got[1]:
+            mismatches += 1
+            print(f"Mismatch: old={expected} new={got}")
+
+    print(f"Cases: {len(cases)}, mismatches: {mismatches}")
+    print(f"Mean time old: {old_time / len(cases) * 1000:.2f} ms, new: {new_time / len(cases) * 1000:.3f} ms")
+    sys.exit(1 if mismatches else 0)
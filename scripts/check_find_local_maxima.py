@@ -0,0 +1,77 @@
+"""Property check: the vectorized find_local_maxima returns exactly the indices of the original loop.
+
+Random profiles cover plateaus (ties within tolerance), x gaps around gap_threshold,
+short arrays, gap_threshold=None and the integer x values contours produce.
+
+Usage: python check_find_local_maxima.py [number of cases] [seed]
+"""
+import os
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import ImageProcessLib as IPL
+
+
+def find_local_maxima_reference(X, Y, DST, tolerance=1e-5, gap_threshold=40):
+    # The find_local_maxima loop as it was before vectorizing
+    maxima = []
+    maxima_indices = []
+    n = len(Y)
+    
+    for i in range(DST, n - DST):
+        is_maxima = True
+        
+        for j in range(1, DST + 1):
+            # If gap_threshold is defined, check for disconnections
+            if gap_threshold is not None and (X[i] - X[i - j] > gap_threshold or X[i + j] - X[i] > gap_threshold):
+                continue  # Skip this neighbor due to a large gap
+            
+            # Allow some tolerance for "almost equal" points
+            if Y[i] < Y[i - j] - tolerance or Y[i] < Y[i + j] - tolerance:
+                is_maxima = False
+                break
+        
+        if is_maxima:
+            maxima.append(Y[i])
+            maxima_indices.append(i)
+    
+    return maxima_indices
+
+
+def random_profile(rng):
+    n = int(rng.integers(0, 600))
+    steps = rng.choice([0, 1, 1, 1, 2, 5, 39, 40, 41, 120], size=n)
+    X = np.cumsum(steps).astype(np.int32)
+    kind = rng.integers(0, 3)
+    if kind == 0:
+        Y = rng.normal(0, 1, n)
+    elif kind == 1:
+        Y = np.round(np.sin(np.arange(n) / rng.uniform(3, 30)) * 50, 1) # plateaus and exact ties
+    else:
+        Y = np.abs(rng.normal(0, 1, n)).cumsum() % 7 + rng.choice([0, 1e-6, 2e-5], size=n)
+    return X, Y
+
+
+if __name__ == '__main__':
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = np.random.default_rng(int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+
+    failures = 0
+    for case in range(cases):
+        X, Y = random_profile(rng)
+        DST = int(rng.choice([1, 2, 5, 40]))
+        tolerance = float(rng.choice([0, 1e-5, 0.1]))
+        gap_threshold = rng.choice([None, 1, 40])
+        expected = find_local_maxima_reference(X, Y, DST, tolerance, gap_threshold)
+        got = IPL.find_local_maxima(X, Y, DST, tolerance, gap_threshold)
+        if list(expected) != list(got):
+            failures += 1
+            print(f"case {case}: n={len(Y)} DST={DST} tol={tolerance} gap={gap_threshold}")
+            print(f"  old={expected}\n  new={got}")
+
+    print(f"Cases: {cases}, failures: {failures}")
+    sys.exit(1 if failures else 0)